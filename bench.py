@@ -0,0 +1,408 @@
+import os
+import sys
+import json
+import time
+import gzip
+import random
+import struct
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+
+import convert
+import nbtreader
+from nbtreader import (TAG_BYTE, TAG_SHORT, TAG_INT, TAG_FLOAT, TAG_DOUBLE, TAG_STRING, TAG_LIST, TAG_COMPOUND,
+                       TAG_INT_ARRAY)
+
+# Synthetic player.dat benchmark:
+#   python ./bench.py [--files N] [--rounds R] [--scenario NAME ...] [--save BASELINE] [--compare BASELINE]
+#   python ./bench.py --dir PLAYERDATA [--rounds R] [--save BASELINE] [--compare BASELINE]
+#   python ./bench.py --startup [--rounds R] [--save BASELINE] [--compare BASELINE]
+
+
+# Minimal NBT writer, a tag is a (tag id, payload bytes) pair
+
+def byte(value):
+    return TAG_BYTE, struct.pack('>b', value)
+
+
+def short(value):
+    return TAG_SHORT, struct.pack('>h', value)
+
+
+def int_(value):
+    return TAG_INT, struct.pack('>i', value)
+
+
+def float_(value):
+    return TAG_FLOAT, struct.pack('>f', value)
+
+
+def double(value):
+    return TAG_DOUBLE, struct.pack('>d', value)
+
+
+def string(value):
+    value = value.encode('utf-8')
+    return TAG_STRING, struct.pack('>H', len(value)) + value
+
+
+def int_array(values):
+    return TAG_INT_ARRAY, struct.pack(f'>i{len(values)}i', len(values), *values)
+
+
+def list_(tag_id, items):
+    return TAG_LIST, struct.pack('>bi', tag_id, len(items)) + b''.join(payload for _, payload in items)
+
+
+def compound(tags):
+    parts = []
+    for name, (tag_id, payload) in tags.items():
+        name = name.encode('utf-8')
+        parts.append(struct.pack('>bH', tag_id, len(name)) + name + payload)
+    parts.append(b'\x00')
+    return TAG_COMPOUND, b''.join(parts)
+
+
+def nbt_file(tags):
+    return gzip.compress(b'\x0a\x00\x00' + compound(tags)[1])
+
+
+# Item generators
+
+MATERIALS = ('stone', 'cobblestone', 'dirt', 'oak_log', 'torch', 'bread', 'iron_ingot', 'redstone', 'glass',
+             'oak_planks', 'coal', 'arrow')
+ENCHANTS = ('protection', 'sharpness', 'unbreaking', 'mending', 'efficiency', 'fortune', 'looting', 'power',
+            'fire_aspect', 'knockback', 'thorns', 'respiration')
+TOOLS = ('diamond_sword', 'netherite_pickaxe', 'diamond_helmet', 'netherite_chestplate', 'bow', 'trident')
+
+
+def item(item_id, count=1, tag=None, slot=None):
+    tags = {}
+    if slot is not None:
+        tags['Slot'] = byte(slot)
+    tags['id'] = string('minecraft:' + item_id)
+    tags['Count'] = byte(count)
+    if tag is not None:
+        tags['tag'] = compound(tag)
+    return compound(tags)
+
+
+def plain_item(rnd, slot=None):
+    return item(rnd.choice(MATERIALS), rnd.randint(1, 64), slot=slot)
+
+
+def enchanted_item(rnd, slot=None):
+    enchants = [compound({'id': string('minecraft:' + enchant), 'lvl': short(rnd.randint(1, 5))})
+                for enchant in rnd.sample(ENCHANTS, 8)]
+    modifiers = [compound({
+        'AttributeName': string('minecraft:generic.attack_damage'),
+        'Name': string('modifier'),
+        'Amount': double(rnd.random() * 10),
+        'Operation': int_(0),
+        'UUID': int_array([rnd.getrandbits(31) for _ in range(4)]),
+        'Slot': string('mainhand'),
+    }) for _ in range(3)]
+    tag = {
+        'Damage': int_(rnd.randint(0, 100)),
+        'RepairCost': int_(rnd.randint(1, 39)),
+        'Enchantments': list_(TAG_COMPOUND, enchants),
+        'AttributeModifiers': list_(TAG_COMPOUND, modifiers),
+        'display': compound({'Name': string('{"text":"Relic %d"}' % rnd.randint(0, 9)),
+                             'Lore': list_(TAG_STRING, [string('lore line %d' % i) for i in range(4)])}),
+    }
+    return item(rnd.choice(TOOLS), tag=tag, slot=slot)
+
+
+def nested_item(rnd, slot=None, depth=4):
+    if depth == 0:
+        return plain_item(rnd)
+    if rnd.random() < 0.5:
+        projectiles = [item('arrow'), item('firework_rocket', tag={
+            'Fireworks': compound({'Flight': byte(1), 'Explosions': list_(TAG_COMPOUND, [compound({
+                'Type': byte(1), 'Colors': int_array([0xff0000, 0x00ff00])})])})})]
+        return item('crossbow', tag={'Charged': byte(1), 'ChargedProjectiles': list_(TAG_COMPOUND, projectiles)},
+                    slot=slot)
+    items = [nested_item(rnd, depth=depth - 1) for _ in range(3)]
+    return item('bundle', tag={'Items': list_(TAG_COMPOUND, items)}, slot=slot)
+
+
+def book_item(rnd, slot=None):
+    pages = [string('{"text":"Page %d: %s"}' % (i, 'lorem ipsum ' * rnd.randint(5, 20))) for i in range(50)]
+    pages += [string('Legacy §cpage %d with www.example.com link\nand new line' % i) for i in range(50)]
+    return item('written_book', tag={
+        'title': string('Book %d' % rnd.randint(0, 9)),
+        'author': string('Author'),
+        'generation': int_(0),
+        'resolved': byte(1),
+        'pages': list_(TAG_STRING, pages),
+    }, slot=slot)
+
+
+def unknown_tags_item(rnd, slot=None):
+    tag = {f'custom_{i}': string('value %d' % rnd.randint(0, 1000)) for i in range(10)}
+    tag['CustomData'] = compound({f'key_{i}': int_array([rnd.getrandbits(31) for _ in range(16)]) for i in range(8)})
+    tag['display'] = compound({'Name': string('{"text":"Custom"}')})
+    return item(rnd.choice(MATERIALS), rnd.randint(1, 64), tag=tag, slot=slot)
+
+
+SCENARIOS = {
+    'empty': None,
+    'full': plain_item,
+    'enchanted': enchanted_item,
+    'nested': nested_item,
+    'books': book_item,
+    'unknown_tags': unknown_tags_item,
+}
+
+
+def player_tags(rnd, make_item, name):
+    inventory = []
+    ender_items = []
+    if make_item is not None:
+        inventory = [make_item(rnd, slot) for slot in range(36)]
+        inventory += [make_item(rnd, slot) for slot in (100, 101, 102, 103, -106)]
+        ender_items = [make_item(rnd, slot) for slot in range(27)]
+    return {
+        'DataVersion': int_(3465),
+        'playerGameType': int_(0),
+        'Inventory': list_(TAG_COMPOUND, inventory),
+        'EnderItems': list_(TAG_COMPOUND, ender_items),
+        'Pos': list_(TAG_DOUBLE, [double(rnd.uniform(-1e4, 1e4)), double(rnd.uniform(-64, 320)),
+                                  double(rnd.uniform(-1e4, 1e4))]),
+        'Rotation': list_(TAG_FLOAT, [float_(rnd.uniform(-180, 180)), float_(rnd.uniform(-90, 90))]),
+        'Dimension': string(rnd.choice(('minecraft:overworld', 'minecraft:the_nether', 'minecraft:the_end'))),
+        'SpawnDimension': string('minecraft:overworld'),
+        'SpawnX': int_(rnd.randint(-1000, 1000)),
+        'SpawnY': int_(64),
+        'SpawnZ': int_(rnd.randint(-1000, 1000)),
+        'SpawnAngle': float_(0.0),
+        'ActiveEffects': list_(TAG_COMPOUND, [compound({
+            'Id': byte(1), 'Duration': int_(600), 'Amplifier': byte(1), 'Ambient': byte(0),
+            'ShowParticles': byte(1), 'ShowIcon': byte(1)})]),
+        'foodExhaustionLevel': float_(rnd.random() * 4),
+        'foodLevel': int_(rnd.randint(0, 20)),
+        'XpLevel': int_(rnd.randint(0, 100)),
+        'XpP': float_(rnd.random()),
+        'Health': float_(rnd.uniform(1, 20)),
+        'XpTotal': int_(rnd.randint(0, 10000)),
+        'FallDistance': float_(0.0),
+        'Fire': short(-20),
+        'foodSaturationLevel': float_(5.0),
+        'Air': short(300),
+        'recipeBook': compound({'recipes': list_(TAG_STRING, [string(f'minecraft:recipe_{i}') for i in range(800)])}),
+        'bukkit': compound({'lastKnownName': string(name)}),
+    }
+
+
+def generate(directory, scenario, files, seed=0):
+    rnd = random.Random(f'{scenario}/{seed}')
+    make_item = SCENARIOS[scenario]
+    filenames = []
+    for number in range(files):
+        filename = os.path.join(directory, f'{scenario}-{number:05d}.dat')
+        with open(filename, 'wb') as out_file:
+            out_file.write(nbt_file(player_tags(rnd, make_item, f'{scenario}{number}')))
+        filenames.append(filename)
+    return filenames
+
+
+def count_items(player, json_data):
+    # Same count as --stats: the Inventory and EnderItems stacks and the bundle/crossbow stacks nested in them
+    [section] = json_data.values()
+    stacks = [*section['inventoryContents'].values(), *section['armorContents'].values(),
+              *section['enderChestContents'].values()]
+    if any(tag['Slot'].value == -106 for tag in player['Inventory']):
+        stacks.append(section['offHandItem'])
+    return sum(map(convert.count_item_stacks, stacks))
+
+
+def run_round(filenames, out_dir=None):
+    # Parse includes reading and gunzipping the file. Dump is json.dumps, or writing the json file into out_dir.
+    parse_time = serialize_time = dump_time = 0.0
+    items = 0
+    for number, filename in enumerate(filenames):
+        start = time.perf_counter()
+        player = nbtreader.load(filename, convert.PLAYER_TAGS)
+        parsed = time.perf_counter()
+        json_data = convert.serialize_player_nbt(player, 'world')
+        serialized = time.perf_counter()
+        if out_dir is None:
+            json.dumps(json_data)
+        else:
+            convert.write_json(json_data, os.path.join(out_dir, f'{number}.json'))
+        dumped = time.perf_counter()
+        parse_time += parsed - start
+        serialize_time += serialized - parsed
+        dump_time += dumped - serialized
+        items += count_items(player, json_data)
+    return parse_time, serialize_time, dump_time, items
+
+
+def bench_scenario(directory, scenario, files, rounds):
+    return bench_files(generate(directory, scenario, files), rounds)
+
+
+def io_syscalls():
+    # (read, write) syscall counters of this process, None without /proc/self/io (not Linux)
+    try:
+        with open('/proc/self/io') as in_file:
+            counters = dict(line.split(': ') for line in in_file.read().splitlines())
+    except OSError:
+        return None
+    return int(counters['syscr']), int(counters['syscw'])
+
+
+def bench_files(filenames, rounds, out_dir=None):
+    files = len(filenames)
+    syscalls_before = io_syscalls()
+    results = [run_round(filenames, out_dir) for _ in range(rounds)]
+    syscalls_after = io_syscalls()
+    parse_time, serialize_time, dump_time = (statistics.median(result[i] for result in results) for i in range(3))
+    items = results[0][3]
+    total = parse_time + serialize_time + dump_time
+    result = {
+        'files': files,
+        'items': items,
+        'parse_s': parse_time,
+        'serialize_s': serialize_time,
+        'dump_s': dump_time,
+        'files_per_s': files / total if total else 0.0,
+        'items_per_s': items / total if total else 0.0,
+    }
+    if syscalls_before and syscalls_after and files:
+        result['read_syscalls_per_file'] = (syscalls_after[0] - syscalls_before[0]) / (files * rounds)
+        result['write_syscalls_per_file'] = (syscalls_after[1] - syscalls_before[1]) / (files * rounds)
+    return result
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+# Cold start commands of --startup, python arguments run in a fresh interpreter ({file}: a generated player with
+# empty inventories, {dir}: its directory, {out}: an output directory)
+STARTUP_COMMANDS = {
+    'python': ['-c', 'pass'],
+    'import convert': ['-c', 'import convert'],
+    'pool worker': ['-c', 'import convert; convert.init_worker(None)'],
+    'convert file': ['convert.py', '{file}', '-o', '{out}'],
+    'scan': ['scan.py', '{dir}'],
+}
+# Startup budget in ms over the bare interpreter, --startup marks commands above it
+STARTUP_BUDGET_MS = {
+    'import convert': 40,
+    'pool worker': 40,
+    'convert file': 80,
+    'scan': 80,
+}
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(args, importtime=False):
+    # Returns wall time, or the number of imported modules with importtime
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *(('-X', 'importtime') if importtime else ()), *args], cwd=SOURCE_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True, text=True)
+    elapsed = time.perf_counter() - start
+    if importtime:
+        return sum(1 for line in result.stderr.splitlines()
+                   if line.startswith('import time:') and not line.endswith('imported package'))
+    return elapsed
+
+
+def bench_startup(directory, rounds):
+    player_filename = generate(directory, 'empty', 1)[0]
+    paths = {'file': player_filename, 'dir': directory, 'out': os.path.join(directory, 'out')}
+    os.makedirs(paths['out'])
+    report = {}
+    for name, args in STARTUP_COMMANDS.items():
+        args = [arg.format(**paths) for arg in args]
+        run_python(args)  # warm up the OS cache and the .pyc files
+        report[name] = {
+            'ms': statistics.median(run_python(args) for _ in range(rounds)) * 1000,
+            'modules': run_python(args, importtime=True),
+        }
+    for name, result in report.items():
+        result['over_python_ms'] = result['ms'] - report['python']['ms']
+        result['budget_ms'] = STARTUP_BUDGET_MS.get(name)
+    return report
+
+
+def print_startup_report(report, baseline=None):
+    print(f'{"command":<16}{"ms":>9}{"+ms":>9}{"budget":>8}{"modules":>9}' + (f'{"vs base":>10}' if baseline else ''))
+    for name, result in report.items():
+        budget = result['budget_ms']
+        line = (f'{name:<16}{result["ms"]:>9.1f}{result["over_python_ms"]:>9.1f}'
+                f'{budget if budget is not None else "":>8}{result["modules"]:>9}')
+        base = baseline and baseline.get('startup', {}).get(name)
+        if base and result['ms']:
+            line += f'{base["ms"] / result["ms"]:>9.2f}x'
+        if budget is not None and result['over_python_ms'] > budget:
+            line += '  OVER BUDGET'
+        print(line)
+
+
+def print_report(report, baseline=None):
+    print(f'{"scenario":<14}{"parse s":>10}{"serialize s":>13}{"dump s":>10}{"files/s":>11}{"items/s":>12}'
+          + (f'{"vs base":>10}' if baseline else ''))
+    for scenario, result in report['scenarios'].items():
+        line = (f'{scenario:<14}{result["parse_s"]:>10.4f}{result["serialize_s"]:>13.4f}{result["dump_s"]:>10.4f}'
+                f'{result["files_per_s"]:>11.1f}{result["items_per_s"]:>12.1f}')
+        base = baseline and baseline['scenarios'].get(scenario)
+        if base and base['files_per_s']:
+            line += f'{result["files_per_s"] / base["files_per_s"]:>9.2f}x'
+        print(line)
+        if 'read_syscalls_per_file' in result:
+            print(f'{"":<14}{result["read_syscalls_per_file"]:.1f} read and {result["write_syscalls_per_file"]:.1f} '
+                  f'write syscalls per file')
+    print(f'peak RSS: {report["peak_rss_mb"]:.1f} MiB')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the converter on synthetic player.dat files')
+    parser.add_argument('--files', type=int, default=50, help='generated files per scenario')
+    parser.add_argument('--rounds', type=int, default=5, help='timed rounds per scenario, median is reported')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only given scenarios')
+    parser.add_argument('--item-cache', type=int, default=0, metavar='MB', help='enable the item stack cache')
+    parser.add_argument('--dir', metavar='PLAYERDATA',
+                        help='benchmark the files of a playerdata directory with json file writes instead of '
+                             'synthetic scenarios')
+    parser.add_argument('--startup', action='store_true',
+                        help='measure the cold start of fresh interpreters instead of the conversion throughput')
+    parser.add_argument('--save', metavar='BASELINE', help='store results as a baseline json file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare files/s with a stored baseline')
+    args = parser.parse_args(argv)
+
+    convert.enable_item_cache(args.item_cache << 20)
+    report = {'python': sys.version.split()[0], 'files': args.files, 'rounds': args.rounds}
+    with tempfile.TemporaryDirectory() as directory:
+        if args.startup:
+            report['startup'] = bench_startup(directory, args.rounds)
+        elif args.dir:
+            name = os.path.basename(os.path.normpath(args.dir))
+            report['scenarios'] = {name: bench_files(convert.find_player_files(args.dir), args.rounds, directory)}
+        else:
+            report['scenarios'] = {scenario: bench_scenario(directory, scenario, args.files, args.rounds)
+                                   for scenario in args.scenario or SCENARIOS}
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as in_file:
+            baseline = json.load(in_file)
+    if args.startup:
+        print_startup_report(report['startup'], baseline)
+    else:
+        print_report(report, baseline)
+    if args.save:
+        with open(args.save, 'w') as out_file:
+            json.dump(report, out_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import re
+import json
+import functools
+
+# Book page normalization of CraftMetaBook
+# https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/inventory/CraftMetaBook.java#111
+# https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/util/CraftChatMessage.java
+# Lengths and substrings are counted in UTF-16 code units like java.lang.String
+
+MAX_PAGE_LENGTH = 320
+PAGE_CACHE_SIZE = 8192
+
+COLOR_CHAR = '\u00a7'
+LINE_TERMINATORS = '\n\r\u0085\u2028\u2029'  # not matched by '.' of java.util.regex
+# CraftChatMessage.StringMessage.INCREMENTAL_PATTERN_KEEP_NEWLINES
+INCREMENTAL_PATTERN_KEEP_NEWLINES = re.compile(
+    f'({COLOR_CHAR}[0-9a-fk-orx])'
+    rf'|((?:(?:https?):\/\/)?(?:[-\w_\.]{{2,}}\.[a-z]{{2,4}}[^{LINE_TERMINATORS}]*?'
+    rf'(?=[\.\?!,;:]?(?:[{COLOR_CHAR} ]|(?:\r\n|[{LINE_TERMINATORS}])?\Z))))',
+    re.IGNORECASE | re.ASCII)
+
+# net.minecraft.EnumChatFormat
+COLOR_CODES = {
+    '0': 'black', '1': 'dark_blue', '2': 'dark_green', '3': 'dark_aqua', '4': 'dark_red', '5': 'dark_purple',
+    '6': 'gold', '7': 'gray', '8': 'dark_gray', '9': 'blue', 'a': 'green', 'b': 'aqua', 'c': 'red',
+    'd': 'light_purple', 'e': 'yellow', 'f': 'white',
+}
+FORMAT_CODES = {'k': 'obfuscated', 'l': 'bold', 'm': 'strikethrough', 'n': 'underlined', 'o': 'italic'}
+# ChatModifier.ChatModifierSerializer.serialize order
+STYLE_KEYS = ('bold', 'italic', 'underlined', 'strikethrough', 'obfuscated', 'color', 'insertion', 'clickEvent',
+              'hoverEvent', 'font')
+RESET = {'bold': False, 'italic': False, 'underlined': False, 'strikethrough': False, 'obfuscated': False}
+
+# IChatBaseComponent.ChatSerializer.deserialize
+CONTENT_KEYS = ('text', 'translate', 'score', 'selector', 'keybind', 'nbt')
+NBT_SOURCES = ('block', 'entity', 'storage')
+STYLE_PRIMITIVES = ('bold', 'italic', 'underlined', 'strikethrough', 'obfuscated', 'color', 'insertion', 'font')
+STYLE_OBJECTS = ('clickEvent', 'hoverEvent')
+# Characters which end a top level number or keyword for a strict com.google.gson.stream.JsonReader
+GSON_LITERAL_END = set('{}[]:, \t\f\r\n')
+JSON_WHITESPACE = ' \t\n\r'
+
+
+def reject_constant(name):
+    raise ValueError(f'{name} is not valid json')
+
+
+json_decoder = json.JSONDecoder(parse_constant=reject_constant, strict=False)
+
+
+def utf16_length(text):
+    return len(text) + sum(1 for char in text if char > '\uffff')
+
+
+def utf16_substring(text, length):
+    if len(text) <= length // 2 or utf16_length(text) <= length:
+        return text
+    data = text.encode('utf-16-le', 'surrogatepass')[:length * 2]
+    return data.decode('utf-16-le', 'surrogatepass')
+
+
+def is_primitive(element):
+    return isinstance(element, (str, int, float))
+
+
+def is_optional_primitive(element, key):
+    return key not in element or is_primitive(element[key])
+
+
+def is_style(element):
+    # Only the member types are checked, values of click and hover events are not
+    return (all(is_optional_primitive(element, key) for key in STYLE_PRIMITIVES)
+            and all(isinstance(element.get(key, {}), dict) for key in STYLE_OBJECTS))
+
+
+def is_component(element):
+    # False where ChatSerializer.deserialize throws a JsonParseException
+    if is_primitive(element):
+        return True
+    if isinstance(element, list):
+        return len(element) > 0 and all(is_component(child) for child in element)
+    if not isinstance(element, dict):
+        return False
+
+    if 'text' in element:
+        valid = is_primitive(element['text'])
+    elif 'translate' in element:
+        arguments = element.get('with', [])
+        valid = (is_primitive(element['translate']) and is_optional_primitive(element, 'fallback')
+                 and isinstance(arguments, list) and all(is_component(argument) for argument in arguments))
+    elif 'score' in element:
+        score = element['score']
+        valid = (isinstance(score, dict) and 'name' in score and 'objective' in score
+                 and is_primitive(score['name']) and is_primitive(score['objective']))
+    elif 'selector' in element:
+        valid = is_primitive(element['selector']) and ('separator' not in element or is_component(element['separator']))
+    elif 'keybind' in element:
+        valid = is_primitive(element['keybind'])
+    elif 'nbt' in element:
+        sources = [key for key in NBT_SOURCES if key in element]
+        valid = (is_primitive(element['nbt']) and is_optional_primitive(element, 'interpret')
+                 and ('separator' not in element or is_component(element['separator']))
+                 and bool(sources) and is_primitive(element[sources[0]]))
+    else:
+        valid = False
+    if not valid:
+        return False
+
+    if 'extra' in element:
+        extra = element['extra']
+        if not isinstance(extra, list) or len(extra) == 0 or not all(is_component(child) for child in extra):
+            return False
+    return is_style(element)
+
+
+def parse_component(message):
+    # CraftChatMessage.fromJSONOrNull: a strict gson reader, text after the first json value is ignored
+    pos = 0
+    while pos < len(message) and message[pos] in JSON_WHITESPACE:
+        pos += 1
+    try:
+        element, end = json_decoder.raw_decode(message, pos)
+    except ValueError:
+        return None
+    if element is None:
+        return None
+    if not isinstance(element, (str, list, dict)) and end < len(message) and message[end] not in GSON_LITERAL_END:
+        # '1.5x' or 'trueish' are unquoted strings for gson, not allowed without lenient mode
+        return None
+    return element
+
+
+def to_json(component):
+    # Gson of ChatSerializer has html escaping disabled but still escapes the unicode line separators
+    data = json.dumps(component, ensure_ascii=False, separators=(',', ':'))
+    return data.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def literal(text, style):
+    component = {key: style[key] for key in STYLE_KEYS if style.get(key) is not None}
+    component['text'] = text
+    return component
+
+
+def parse_hex_color(value):
+    # ChatHexColor.parseColor: invalid digits give no color
+    try:
+        return f'#{int(value[1:], 16):06X}'
+    except ValueError:
+        return None
+
+
+def string_to_json(message):
+    # new StringMessage(message, keepNewlines=true, plain=false).getOutput()[0] -> ChatSerializer.toJson
+    extra = []
+    style = {}
+    hex_color = None
+    needs_add = False
+    current = 0
+    for match in INCREMENTAL_PATTERN_KEEP_NEWLINES.finditer(message):
+        group = 1 if match.group(1) is not None else 2
+        start, end = match.span(group)
+        if start > current:
+            needs_add = False
+            extra.append(literal(message[current:start], style))
+        if group == 1:
+            code = match.group(1)[1].lower()
+            if code == 'x':
+                hex_color = '#'
+            elif hex_color is not None:
+                hex_color += code
+                if len(hex_color) == 7:
+                    style = dict(RESET, color=parse_hex_color(hex_color))
+                    hex_color = None
+            elif code in FORMAT_CODES:
+                style = dict(style, **{FORMAT_CODES[code]: True})
+            else:
+                # Colors and reset clear the formatting
+                style = dict(RESET, color=COLOR_CODES.get(code))
+            needs_add = True
+        else:
+            url = match.group(2)
+            if not url.startswith(('http://', 'https://')):
+                url = 'http://' + url
+            extra.append(literal(message[start:end], dict(style, clickEvent={'action': 'open_url', 'value': url})))
+        current = end
+    if current < len(message) or needs_add:
+        extra.append(literal(message[current:], style))
+
+    component = {'extra': extra} if extra else {}
+    component['text'] = ''
+    return to_json(component)
+
+
+@functools.lru_cache(maxsize=PAGE_CACHE_SIZE)
+def signed_page(page):
+    # CraftChatMessage.fromJSONOrStringToJSON(page, false, true, MAX_PAGE_LENGTH, false)
+    if is_component(parse_component(page)):
+        return page
+    return string_to_json(utf16_substring(page, MAX_PAGE_LENGTH))
+
+
+def unsigned_page(page):
+    # CraftMetaBook.validatePage
+    return utf16_substring(page, MAX_PAGE_LENGTH)
@@ -0,0 +1,170 @@
+import os
+import sys
+import array
+import argparse
+import importlib.util
+
+import convert
+import nbtreader
+import tables
+
+# Column-wise export of player locations and stats for analytics:
+#   python ./columns.py <playerdata dir|glob> OUT.npz [-j WORKERS] [--compressed]
+# One typed array per field, row i of every array is the player uuid[i] / name[i]. Dimensions are int8 codes into
+# dimension_names (the numeric dimensions of pre-1.16 files under their names), missing spawn points have has_spawn
+# False. Workers send plain dicts, columns are kept in compact
+# array.array buffers and numpy (optional, only needed here) is imported when the file is written:
+#   d = numpy.load('players.npz')
+#   the_end = list(d['dimension_names']).index('minecraft:the_end')
+#   d['name'][(d['y'] < -60) & (d['dimension'] == the_end)]
+
+DIMENSIONS = ('minecraft:overworld', 'minecraft:the_nether', 'minecraft:the_end')
+# World suffix -> dimension name, numeric dimensions are named through the suffix of their file's table set
+DIMENSION_NAMES = {suffix: name for name, suffix in tables.for_version(None).dimensions.items()}
+
+# column -> array typecode, the numpy dtype of the same name is used in the .npz
+COLUMNS = {
+    'game_mode': 'b',
+    'dimension': 'b',
+    'x': 'd',
+    'y': 'd',
+    'z': 'd',
+    'yaw': 'f',
+    'pitch': 'f',
+    'has_spawn': 'b',
+    'spawn_dimension': 'b',
+    'spawn_x': 'i',
+    'spawn_y': 'i',
+    'spawn_z': 'i',
+    'spawn_angle': 'f',
+    'health': 'f',
+    'food_level': 'i',
+    'food_saturation': 'f',
+    'food_exhaustion': 'f',
+    'xp_level': 'i',
+    'xp_progress': 'f',
+    'xp_total': 'i',
+    'fall_distance': 'f',
+    'fire': 'h',
+    'air': 'h',
+}
+# column -> root tag holding a single value
+SCALAR_TAGS = {
+    'game_mode': 'playerGameType',
+    'spawn_x': 'SpawnX',
+    'spawn_y': 'SpawnY',
+    'spawn_z': 'SpawnZ',
+    'spawn_angle': 'SpawnAngle',
+    'health': 'Health',
+    'food_level': 'foodLevel',
+    'food_saturation': 'foodSaturationLevel',
+    'food_exhaustion': 'foodExhaustionLevel',
+    'xp_level': 'XpLevel',
+    'xp_progress': 'XpP',
+    'xp_total': 'XpTotal',
+    'fall_distance': 'FallDistance',
+    'fire': 'Fire',
+    'air': 'Air',
+}
+COLUMN_TAGS = frozenset(SCALAR_TAGS.values()) | {'Dimension', 'Pos', 'Rotation', 'SpawnDimension', 'bukkit',
+                                                  'DataVersion'}
+
+
+def dimension_code(dimension, dimensions):
+    # Codes of custom dimensions are added in order of appearance
+    if dimension not in dimensions:
+        dimensions.append(dimension)
+    return dimensions.index(dimension)
+
+
+def dimension_name(dimension, table_set):
+    if isinstance(dimension, int):
+        return DIMENSION_NAMES[table_set.dimensions[dimension]]
+    return dimension
+
+
+def player_row(player):
+    # Returns {column: value} with dimension names not yet coded, floats are NaN and ints 0 where a tag is missing
+    row = {column: player[tag].value if tag in player else None for column, tag in SCALAR_TAGS.items()}
+    row['x'], row['y'], row['z'] = (tag.value for tag in player['Pos'])
+    row['yaw'], row['pitch'] = (tag.value for tag in player['Rotation'])
+    row['has_spawn'] = 'SpawnX' in player
+    table_set = tables.for_version(player['DataVersion'].value if 'DataVersion' in player else None)
+    row['dimension'] = dimension_name(player['Dimension'].value, table_set)
+    if 'SpawnDimension' in player:
+        row['spawn_dimension'] = dimension_name(player['SpawnDimension'].value, table_set)
+    else:
+        row['spawn_dimension'] = DIMENSIONS[0]
+    for column, typecode in COLUMNS.items():
+        if row[column] is None:
+            row[column] = float('nan') if typecode in 'fd' else 0
+    return row
+
+
+def read_row(player_filename):
+    player = nbtreader.load(player_filename, COLUMN_TAGS)
+    name = player['bukkit']['lastKnownName'].value if 'bukkit' in player else ''
+    uuid = os.path.splitext(os.path.basename(player_filename))[0]
+    return uuid, name, player_row(player)
+
+
+def column_task(player_filename):
+    return (player_filename, *convert.run_guarded(read_row, player_filename), None)
+
+
+class Columns:
+    def __init__(self):
+        self.uuids = []
+        self.names = []
+        self.dimensions = list(DIMENSIONS)
+        self.columns = {column: array.array(typecode) for column, typecode in COLUMNS.items()}
+
+    def add(self, uuid, name, row):
+        self.uuids.append(uuid)
+        self.names.append(name)
+        row['dimension'] = dimension_code(row['dimension'], self.dimensions)
+        row['spawn_dimension'] = dimension_code(row['spawn_dimension'], self.dimensions)
+        for column, values in self.columns.items():
+            values.append(row[column])
+
+    def save(self, path, compressed=False):
+        import numpy
+
+        arrays = {column: numpy.frombuffer(values, dtype=values.typecode) if values else
+                  numpy.zeros(0, dtype=values.typecode) for column, values in self.columns.items()}
+        arrays['has_spawn'] = arrays['has_spawn'].astype(bool)
+        arrays['uuid'] = numpy.array(self.uuids, dtype=str)
+        arrays['name'] = numpy.array(self.names, dtype=str)
+        arrays['dimension_names'] = numpy.array(self.dimensions, dtype=str)
+        (numpy.savez_compressed if compressed else numpy.savez)(path, **arrays)
+
+
+def export(player_filenames, path, workers=None, compressed=False):
+    results = convert.BatchResults()
+    columns = Columns()
+    for result in convert.run_tasks(column_task, player_filenames, workers=workers, ordered=True):
+        row = results.add(result, keep=False)
+        if row is not None:
+            columns.add(*row)
+    columns.save(path, compressed)
+    results.finish()
+    return results.converted, results.failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export player locations and stats as numpy columns (.npz)')
+    parser.add_argument('source', help='playerdata directory, glob pattern or a single player.dat file')
+    parser.add_argument('output', help='.npz file')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--compressed', action='store_true', help='write a compressed .npz')
+    args = parser.parse_args(argv)
+
+    if importlib.util.find_spec('numpy') is None:
+        # Checked up front, not after reading every file
+        parser.error('numpy is needed for the .npz export: pip install numpy')
+    _, failures = export(convert.find_player_files(args.source), args.output, args.workers, args.compressed)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,48 @@
+import os
 import sys
-import io
 import json
+import time
 import base64
+import hashlib
+import importlib
+import itertools
+import threading
+from collections import OrderedDict
 
-import nbt
+import nbtreader
+import profiling
+import tables
 
 # https://minecraft.wiki/w/Item_format
 # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/bukkit/
 # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/
 # https://github.com/Multiverse/Multiverse-Inventories/
 
-BUKKIT_VERSION = 3465
+# Startup: modules needed only by some items, options or the command line (process pool, argparse, glob,
+# chatmessage, snbt, playerprofile, mvinv, manifest, shards) are imported on first use, so a library import,
+# a single file conversion or a spawned pool worker doesn't pay for them. `python ./bench.py --startup` measures it.
+
+
+class LazyModule:
+    # Module global which imports the module on first attribute access and replaces itself with it, so item
+    # serializers pay for the import once instead of an import statement per item
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.name)
+        globals()[self.name] = module
+        return getattr(module, attr)
+
+
+chatmessage = LazyModule('chatmessage')
+snbt = LazyModule('snbt')
+playerprofile = LazyModule('playerprofile')
+
+# Data version of the target server, also the ItemStack version of files without DataVersion
+BUKKIT_VERSION = tables.DEFAULT_DATA_VERSION
+# Bump on any change of the produced json, so incremental runs convert everything again
+CONVERTER_VERSION = 6
 GAME_MODES = ('SURVIVAL', 'CREATIVE', 'ADVENTURE', 'SPECTATOR')
 
 # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/inventory/CraftMetaItem.java#1394
@@ -39,29 +71,7 @@ HANDLED_TAGS = (
 
 
 def serialize_enchantments(enchantments_tag):
-    id_to_enchant = {
-        'protection': 'PROTECTION_ENVIRONMENTAL',
-        'fire_protection': 'PROTECTION_FIRE',
-        'feather_falling': 'PROTECTION_FALL',
-        'blast_protection': 'PROTECTION_EXPLOSIONS',
-        'projectile_protection': 'PROTECTION_PROJECTILE',
-        'respiration': 'OXYGEN',
-        'aqua_affinity': 'WATER_WORKER',
-        'sharpness': 'DAMAGE_ALL',
-        'smite': 'DAMAGE_UNDEAD',
-        'bane_of_arthropods': 'DAMAGE_ARTHROPODS',
-        'looting': 'LOOT_BONUS_MOBS',
-        'sweeping': 'SWEEPING_EDGE',
-        'efficiency': 'DIG_SPEED',
-        'unbreaking': 'DURABILITY',
-        'fortune': 'LOOT_BONUS_BLOCKS',
-        'power': 'ARROW_DAMAGE',
-        'punch': 'ARROW_KNOCKBACK',
-        'flame': 'ARROW_FIRE',
-        'infinity': 'ARROW_INFINITE',
-        'luck_of_the_sea': 'LUCK',
-    }
-
+    id_to_enchant = tables.current().enchantments
     result = {}
     for enchant in enchantments_tag:
         enchant_id = enchant['id'].value.split(':')[1]
@@ -93,7 +103,7 @@ def serialize_potion_effect(effect):
 
 
 def serialize_explosion_effect(effect):
-    effect_types = ('BALL', 'BALL_LARGE', 'STAR', 'CREEPER', 'BURST')
+    effect_types = tables.current().firework_types
     return {
         '==': 'Firework',
         'flicker': bool(effect.get('Flicker', False)),
@@ -104,15 +114,25 @@ def serialize_explosion_effect(effect):
     }
 
 
+def serialize_modifier_uuid(modifier):
+    if 'UUID' in modifier:
+        hexed_uuid = ''.join(format(num & 0xffffffff, '08x') for num in modifier['UUID'])
+    else:
+        # Before 1.16: two longs
+        hexed_uuid = ''.join(format(modifier[key].value & 0xffffffffffffffff, '016x')
+                             for key in ('UUIDMost', 'UUIDLeast'))
+    return f'{hexed_uuid[:8]}-{hexed_uuid[8:12]}-{hexed_uuid[12:16]}-{hexed_uuid[16:20]}-{hexed_uuid[20:]}'
+
+
 def serialize_modifiers(modifiers):
+    attribute_names = tables.current().attribute_names
     result = {}
     for modifier in modifiers:
-        hexed_uuid = [format(num & 0xffffffff, '08x') for num in modifier['UUID']]
         attrib_mod = {
             "==": "org.bukkit.attribute.AttributeModifier",
             'amount': modifier['Amount'].value,
             'name': modifier['Name'].value,
-            'uuid': f'{hexed_uuid[0]}-{hexed_uuid[1][:4]}-{hexed_uuid[1][4:8]}-{hexed_uuid[2][:4]}-{hexed_uuid[2][4:8]}{hexed_uuid[3]}',
+            'uuid': serialize_modifier_uuid(modifier),
             'operation': modifier['Operation'].value,
         }
         if 'Slot' in modifier:
@@ -121,7 +141,9 @@ def serialize_modifiers(modifiers):
                 attrib_mod['slot'] = 'HAND'
             elif attrib_mod['slot'] == 'OFFHAND':
                 attrib_mod['slot'] = 'OFF_HAND'
-        attrib_name = modifier['AttributeName'].value.split(':')[1].replace('.', '_').upper()
+        attrib_name = attribute_names.get(modifier['AttributeName'].value)
+        if attrib_name is None:
+            attrib_name = modifier['AttributeName'].value.split(':')[1].replace('.', '_').upper()
         attrib = result.setdefault(attrib_name, [])
         attrib.append(attrib_mod)
     return result
@@ -148,8 +170,7 @@ def serialize_meta_armor_stand(meta_item_tag):
 
 
 def serialize_meta_banner(meta_item_tag):
-    dye_colors = ('WHITE', 'ORANGE', 'MAGENTA', 'LIGHT_BLUE', 'YELLOW', 'LIME', 'PINK', 'GRAY',
-                  'LIGHT_GRAY', 'CYAN', 'PURPLE', 'BLUE', 'BROWN', 'GREEN', 'RED', 'BLACK')
+    dye_colors = tables.current().dye_colors
     meta = serialize_meta_item(meta_item_tag, 'BANNER')
     entity_tag = meta_item_tag.get('BlockEntityTag')
     if entity_tag is None:
@@ -184,27 +205,9 @@ def serialize_meta_book(meta_item_tag, meta_type='BOOK'):
         meta['author'] = meta_item_tag['author'].value
     if 'pages' in meta_item_tag:
         pages = meta_item_tag['pages']
-        # TODO: Implement book pages normalization
         # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/inventory/CraftMetaBook.java#111
-        # max_page_length = 320
-        # if meta_type == 'BOOK_SIGNED':
-        # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/util/CraftChatMessage.java
-        #     page = CraftChatMessage.fromJSONOrStringToJSON(page,
-        #                                                    nullable=false,
-        #                                                    keepNewlines=true,
-        #                                                    max_page_length,
-        #                                                    checkJsonContentLength=false) ->
-        #     page = "" if null
-        #     IChatBaseComponent component = IChatBaseComponent.ChatSerializer.fromJson(page)
-        #     if component: return page
-        #     else:
-        #         page = page[:max_page_length]
-        #         IChatBaseComponent component = new StringMessage(page, keepNewlines=true, plain=false).getOutput()[0]
-        #         json_page = IChatBaseComponent.ChatSerializer.toJson(component)
-        #
-        # else:
-        #    pages = [page[:max_page_length] for page in pages]
-        meta['pages'] = [page.value for page in pages]
+        normalize_page = chatmessage.signed_page if meta_type == 'BOOK_SIGNED' else chatmessage.unsigned_page
+        meta['pages'] = [normalize_page(page.value) for page in pages]
     if 'resolved' in meta_item_tag:
         meta['resolved'] = bool(meta_item_tag['resolved'].value)
     if 'generation' in meta_item_tag:
@@ -219,22 +222,11 @@ def serialize_meta_book_signed(meta_item_tag):
 
 def serialize_meta_skull(meta_item_tag):
     meta = serialize_meta_item(meta_item_tag, 'SKULL')
-    # TODO: Implement skull owner profile serialization
     # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/inventory/CraftMetaSkull.java
     if 'SkullOwner' in meta_item_tag:
-        # meta['skull-owner'] =
-        # meta_item_tag['SkullOwner'] # TAG_String or TAG_Compound
-        # 1: profile = GameProfileSerializer.readGameProfile(TAG_Compound)
-        # 2: profile = GameProfile(TAG_String) # UUID ?
-        #    -> CraftPlayerProfile(profile).serialize
-        #    https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/profile/CraftPlayerProfile.java#239
-        #    {
-        #        '==': 'PlayerProfile',
-        #        'uniqueId': '',  #if no null
-        #        'name': '',  #if not null
-        #        'properties': []  #if has properties
-        #    }
-        pass
+        profile = playerprofile.serialize_profile(meta_item_tag['SkullOwner'])
+        if profile is not None:
+            meta['skull-owner'] = profile
     if 'BlockEntityTag' in meta_item_tag and 'note_block_sound' in meta_item_tag['BlockEntityTag']:
         meta['note_block_sound'] = meta_item_tag['BlockEntityTag']['note_block_sound'].value
     return meta
@@ -339,9 +331,8 @@ def serialize_meta_crossbow(meta_item_tag):
     meta = serialize_meta_item(meta_item_tag, 'CROSSBOW')
     meta['charged'] = bool(meta_item_tag['Charged'].value)
     if 'ChargedProjectiles' in meta_item_tag and len(meta_item_tag['ChargedProjectiles']) > 0:
-        meta['charged-projectiles'] = [serialize_item_stack(item_stack)
-                                       for item_stack
-                                       in meta_item_tag['ChargedProjectiles']]
+        # item stack tags, serialized by serialize_item_stack (see NESTED_ITEMS_KEYS)
+        meta['charged-projectiles'] = list(meta_item_tag['ChargedProjectiles'])
     return meta
 
 
@@ -375,7 +366,8 @@ def serialize_meta_compass(meta_item_tag):
 def serialize_meta_bundle(meta_item_tag):
     meta = serialize_meta_item(meta_item_tag, 'BUNDLE')
     if 'Items' in meta_item_tag and len(meta_item_tag['Items']) > 0:
-        meta['items'] = [serialize_item_stack(item_stack) for item_stack in meta_item_tag['Items']]
+        # item stack tags, serialized by serialize_item_stack (see NESTED_ITEMS_KEYS)
+        meta['items'] = list(meta_item_tag['Items'])
     return meta
 
 
@@ -406,12 +398,8 @@ def serialize_meta_item(meta_item_tag, meta_type='UNSPECIFIC', internal_tag=None
         meta['custom-model-data'] = meta_item_tag['CustomModelData'].value
 
     if 'BlockStateTag' in meta_item_tag:
-        # TODO: Implement item BlockStateTag serialization
         # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/inventory/CraftMetaItem.java#1250
-        # blockData = meta_item_tag['BlockStateTag'] # TAG_Compound
-        # meta['BlockStateTag'] = CraftNBTTagConfigSerializer.serialize(blockData)
-        #       -> return SnbtPrinterTagVisitor().visit(blockData) (net.minecraft.nbt.SnbtPrinterTagVisitor)
-        pass
+        meta['BlockStateTag'] = snbt.to_snbt(meta_item_tag['BlockStateTag'])
 
     if 'Enchantments' in meta_item_tag and len(meta_item_tag['Enchantments']) > 0:
         meta['enchants'] = serialize_enchantments(meta_item_tag['Enchantments'])
@@ -424,11 +412,7 @@ def serialize_meta_item(meta_item_tag, meta_type='UNSPECIFIC', internal_tag=None
 
     if 'HideFlags' in meta_item_tag:
         hide_flag = meta_item_tag['HideFlags'].value
-        item_flags = zip(format(hide_flag, '08b'),
-                         ('HIDE_ARMOR_TRIM', 'HIDE_DYE', 'HIDE_POTION_EFFECTS', 'HIDE_PLACED_ON',
-                          'HIDE_DESTROYS', 'HIDE_UNBREAKABLE', 'HIDE_ATTRIBUTES', 'HIDE_ENCHANTS')
-                         )
-        meta['ItemFlags'] = [flag for bit, flag in item_flags if bit == '1']
+        meta['ItemFlags'] = [flag for bit, flag in tables.current().item_flags if hide_flag & bit]
 
     if 'Unbreakable' in meta_item_tag:
         meta['Unbreakable'] = bool(meta_item_tag['Unbreakable'].value)
@@ -440,11 +424,7 @@ def serialize_meta_item(meta_item_tag, meta_type='UNSPECIFIC', internal_tag=None
     if internal_tag is not None:
         internal.append(internal_tag)
     if len(internal) > 0:
-        with io.BytesIO() as out:
-            internal_nbt = nbt.nbt.NBTFile()
-            internal_nbt.tags = internal
-            internal_nbt.write_file(fileobj=out)
-            meta['internal'] = base64.b64encode(out.getvalue()).decode('utf-8')
+        meta['internal'] = encode_internal(internal)
 
     # TODO: Implement item custom tags serialization
     # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/inventory/CraftMetaItem.java#1293
@@ -454,101 +434,226 @@ def serialize_meta_item(meta_item_tag, meta_type='UNSPECIFIC', internal_tag=None
     return meta
 
 
-def serialize_meta_fn(item_type: str) -> ():
-    funcs_map = {
-        # ('AIR',): None,
-        ('WRITTEN_BOOK',): serialize_meta_book_signed,
-        ('WRITABLE_BOOK',): serialize_meta_book,
-        ('CREEPER_HEAD', 'CREEPER_WALL_HEAD', 'DRAGON_HEAD', 'DRAGON_WALL_HEAD', 'PIGLIN_HEAD', 'PIGLIN_WALL_HEAD',
-         'PLAYER_HEAD', 'PLAYER_WALL_HEAD', 'SKELETON_SKULL', 'SKELETON_WALL_SKULL', 'WITHER_SKELETON_SKULL',
-         'WITHER_SKELETON_WALL_SKULL', 'ZOMBIE_HEAD', 'ZOMBIE_WALL_HEAD',): serialize_meta_skull,
-        ('CHAINMAIL_HELMET', 'CHAINMAIL_CHESTPLATE', 'CHAINMAIL_LEGGINGS', 'CHAINMAIL_BOOTS', 'DIAMOND_HELMET',
-         'DIAMOND_CHESTPLATE', 'DIAMOND_LEGGINGS', 'DIAMOND_BOOTS', 'GOLDEN_HELMET', 'GOLDEN_CHESTPLATE',
-         'GOLDEN_LEGGINGS', 'GOLDEN_BOOTS', 'IRON_HELMET', 'IRON_CHESTPLATE', 'IRON_LEGGINGS', 'IRON_BOOTS',
-         'NETHERITE_HELMET', 'NETHERITE_CHESTPLATE', 'NETHERITE_LEGGINGS', 'NETHERITE_BOOTS',
-         'TURTLE_HELMET',): serialize_meta_armor,
-        ('LEATHER_HELMET', 'LEATHER_CHESTPLATE', 'LEATHER_LEGGINGS', 'LEATHER_BOOTS',): serialize_meta_colorable_armor,
-        ('LEATHER_HORSE_ARMOR',): serialize_meta_leather_armor,
-        ('POTION', 'SPLASH_POTION', 'LINGERING_POTION', 'TIPPED_ARROW',): serialize_meta_potion,
-        ('FILLED_MAP',): serialize_meta_map,
-        ('FIREWORK_ROCKET',): serialize_meta_firework,
-        ('FIREWORK_STAR',): serialize_meta_charge,
-        ('ENCHANTED_BOOK',): serialize_meta_enchanted_book,
-        ('BLACK_BANNER', 'BLACK_WALL_BANNER', 'BLUE_BANNER', 'BLUE_WALL_BANNER', 'BROWN_BANNER', 'BROWN_WALL_BANNER',
-         'CYAN_BANNER', 'CYAN_WALL_BANNER', 'GRAY_BANNER', 'GRAY_WALL_BANNER', 'GREEN_BANNER', 'GREEN_WALL_BANNER',
-         'LIGHT_BLUE_BANNER', 'LIGHT_BLUE_WALL_BANNER', 'LIGHT_GRAY_BANNER', 'LIGHT_GRAY_WALL_BANNER', 'LIME_BANNER',
-         'LIME_WALL_BANNER', 'MAGENTA_BANNER', 'MAGENTA_WALL_BANNER', 'ORANGE_BANNER', 'ORANGE_WALL_BANNER',
-         'PINK_BANNER', 'PINK_WALL_BANNER', 'PURPLE_BANNER', 'PURPLE_WALL_BANNER', 'RED_BANNER', 'RED_WALL_BANNER',
-         'WHITE_BANNER', 'WHITE_WALL_BANNER', 'YELLOW_BANNER', 'YELLOW_WALL_BANNER',): serialize_meta_banner,
-        ('ALLAY_SPAWN_EGG', 'AXOLOTL_SPAWN_EGG', 'BAT_SPAWN_EGG', 'BEE_SPAWN_EGG', 'BLAZE_SPAWN_EGG',
-         'BREEZE_SPAWN_EGG', 'CAT_SPAWN_EGG', 'CAMEL_SPAWN_EGG', 'CAVE_SPIDER_SPAWN_EGG', 'CHICKEN_SPAWN_EGG',
-         'COD_SPAWN_EGG', 'COW_SPAWN_EGG', 'CREEPER_SPAWN_EGG', 'DOLPHIN_SPAWN_EGG', 'DONKEY_SPAWN_EGG',
-         'DROWNED_SPAWN_EGG', 'ELDER_GUARDIAN_SPAWN_EGG', 'ENDER_DRAGON_SPAWN_EGG', 'ENDERMAN_SPAWN_EGG',
-         'ENDERMITE_SPAWN_EGG', 'EVOKER_SPAWN_EGG', 'FOX_SPAWN_EGG', 'FROG_SPAWN_EGG', 'GHAST_SPAWN_EGG',
-         'GLOW_SQUID_SPAWN_EGG', 'GOAT_SPAWN_EGG', 'GUARDIAN_SPAWN_EGG', 'HOGLIN_SPAWN_EGG', 'HORSE_SPAWN_EGG',
-         'HUSK_SPAWN_EGG', 'IRON_GOLEM_SPAWN_EGG', 'LLAMA_SPAWN_EGG', 'MAGMA_CUBE_SPAWN_EGG', 'MOOSHROOM_SPAWN_EGG',
-         'MULE_SPAWN_EGG', 'OCELOT_SPAWN_EGG', 'PANDA_SPAWN_EGG', 'PARROT_SPAWN_EGG', 'PHANTOM_SPAWN_EGG',
-         'PIGLIN_BRUTE_SPAWN_EGG', 'PIGLIN_SPAWN_EGG', 'PIG_SPAWN_EGG', 'PILLAGER_SPAWN_EGG', 'POLAR_BEAR_SPAWN_EGG',
-         'PUFFERFISH_SPAWN_EGG', 'RABBIT_SPAWN_EGG', 'RAVAGER_SPAWN_EGG', 'SALMON_SPAWN_EGG', 'SHEEP_SPAWN_EGG',
-         'SHULKER_SPAWN_EGG', 'SILVERFISH_SPAWN_EGG', 'SKELETON_HORSE_SPAWN_EGG', 'SKELETON_SPAWN_EGG',
-         'SLIME_SPAWN_EGG', 'SNIFFER_SPAWN_EGG', 'SNOW_GOLEM_SPAWN_EGG', 'SPIDER_SPAWN_EGG', 'SQUID_SPAWN_EGG',
-         'STRAY_SPAWN_EGG', 'STRIDER_SPAWN_EGG', 'TADPOLE_SPAWN_EGG', 'TRADER_LLAMA_SPAWN_EGG',
-         'TROPICAL_FISH_SPAWN_EGG', 'TURTLE_SPAWN_EGG', 'VEX_SPAWN_EGG', 'VILLAGER_SPAWN_EGG', 'VINDICATOR_SPAWN_EGG',
-         'WANDERING_TRADER_SPAWN_EGG', 'WARDEN_SPAWN_EGG', 'WITCH_SPAWN_EGG', 'WITHER_SKELETON_SPAWN_EGG',
-         'WITHER_SPAWN_EGG', 'WOLF_SPAWN_EGG', 'ZOGLIN_SPAWN_EGG', 'ZOMBIE_HORSE_SPAWN_EGG', 'ZOMBIE_SPAWN_EGG',
-         'ZOMBIE_VILLAGER_SPAWN_EGG', 'ZOMBIFIED_PIGLIN_SPAWN_EGG',): serialize_meta_spawn_egg,
-        ('ARMOR_STAND',): serialize_meta_armor_stand,
-        ('KNOWLEDGE_BOOK',): serialize_meta_knowledge_book,
-        ('FURNACE', 'CHEST', 'TRAPPED_CHEST', 'JUKEBOX', 'DISPENSER', 'DROPPER', 'ACACIA_HANGING_SIGN', 'ACACIA_SIGN',
-         'ACACIA_WALL_HANGING_SIGN', 'ACACIA_WALL_SIGN', 'BAMBOO_HANGING_SIGN', 'BAMBOO_SIGN',
-         'BAMBOO_WALL_HANGING_SIGN', 'BAMBOO_WALL_SIGN', 'BIRCH_HANGING_SIGN', 'BIRCH_SIGN', 'BIRCH_WALL_HANGING_SIGN',
-         'BIRCH_WALL_SIGN', 'CHERRY_HANGING_SIGN', 'CHERRY_SIGN', 'CHERRY_WALL_HANGING_SIGN', 'CHERRY_WALL_SIGN',
-         'CRIMSON_HANGING_SIGN', 'CRIMSON_SIGN', 'CRIMSON_WALL_HANGING_SIGN', 'CRIMSON_WALL_SIGN',
-         'DARK_OAK_HANGING_SIGN', 'DARK_OAK_SIGN', 'DARK_OAK_WALL_HANGING_SIGN', 'DARK_OAK_WALL_SIGN',
-         'JUNGLE_HANGING_SIGN', 'JUNGLE_SIGN', 'JUNGLE_WALL_HANGING_SIGN', 'JUNGLE_WALL_SIGN', 'MANGROVE_HANGING_SIGN',
-         'MANGROVE_SIGN', 'MANGROVE_WALL_HANGING_SIGN', 'MANGROVE_WALL_SIGN', 'OAK_HANGING_SIGN', 'OAK_SIGN',
-         'OAK_WALL_HANGING_SIGN', 'OAK_WALL_SIGN', 'SPRUCE_HANGING_SIGN', 'SPRUCE_SIGN', 'SPRUCE_WALL_HANGING_SIGN',
-         'SPRUCE_WALL_SIGN', 'WARPED_HANGING_SIGN', 'WARPED_SIGN', 'WARPED_WALL_HANGING_SIGN', 'WARPED_WALL_SIGN',
-         'SPAWNER', 'BREWING_STAND', 'ENCHANTING_TABLE', 'COMMAND_BLOCK', 'REPEATING_COMMAND_BLOCK',
-         'CHAIN_COMMAND_BLOCK', 'BEACON', 'DAYLIGHT_DETECTOR', 'HOPPER', 'COMPARATOR', 'SHIELD', 'STRUCTURE_BLOCK',
-         'SHULKER_BOX', 'WHITE_SHULKER_BOX', 'ORANGE_SHULKER_BOX', 'MAGENTA_SHULKER_BOX', 'LIGHT_BLUE_SHULKER_BOX',
-         'YELLOW_SHULKER_BOX', 'LIME_SHULKER_BOX', 'PINK_SHULKER_BOX', 'GRAY_SHULKER_BOX', 'LIGHT_GRAY_SHULKER_BOX',
-         'CYAN_SHULKER_BOX', 'PURPLE_SHULKER_BOX', 'BLUE_SHULKER_BOX', 'BROWN_SHULKER_BOX', 'GREEN_SHULKER_BOX',
-         'RED_SHULKER_BOX', 'BLACK_SHULKER_BOX', 'ENDER_CHEST', 'BARREL', 'BELL', 'BLAST_FURNACE', 'CAMPFIRE',
-         'SOUL_CAMPFIRE', 'JIGSAW', 'LECTERN', 'SMOKER', 'BEEHIVE', 'BEE_NEST', 'SCULK_CATALYST', 'SCULK_SHRIEKER',
-         'SCULK_SENSOR', 'CALIBRATED_SCULK_SENSOR', 'CHISELED_BOOKSHELF', 'DECORATED_POT', 'SUSPICIOUS_SAND',
-         'SUSPICIOUS_GRAVEL', 'CRAFTER', 'TRIAL_SPAWNER',): serialize_meta_block_state,
-        ('TROPICAL_FISH_BUCKET',): serialize_meta_tropical_fish_bucket,
-        ('AXOLOTL_BUCKET',): serialize_meta_axolotl_bucket,
-        ('CROSSBOW',): serialize_meta_crossbow,
-        ('SUSPICIOUS_STEW',): serialize_meta_suspicious_stew,
-        ('COD_BUCKET', 'PUFFERFISH_BUCKET', 'SALMON_BUCKET', 'ITEM_FRAME', 'GLOW_ITEM_FRAME',
-         'PAINTING',): serialize_meta_entity_tag,
-        ('COMPASS',): serialize_meta_compass,
-        ('BUNDLE',): serialize_meta_bundle,
-        ('GOAT_HORN',): serialize_meta_music_instrument,
-    }
+def encode_internal(tags):
+    internal_nbt = nbtreader.encode_compound(tags)
+    return base64.b64encode(nbtreader.gzip_compress(internal_nbt)).decode('utf-8')
+
+
+# Meta kind of tables.META_MATERIALS -> serialize meta function
+META_SERIALIZERS = {
+    'book_signed': serialize_meta_book_signed,
+    'book': serialize_meta_book,
+    'skull': serialize_meta_skull,
+    'armor': serialize_meta_armor,
+    'colorable_armor': serialize_meta_colorable_armor,
+    'leather_armor': serialize_meta_leather_armor,
+    'potion': serialize_meta_potion,
+    'map': serialize_meta_map,
+    'firework': serialize_meta_firework,
+    'charge': serialize_meta_charge,
+    'enchanted_book': serialize_meta_enchanted_book,
+    'banner': serialize_meta_banner,
+    'spawn_egg': serialize_meta_spawn_egg,
+    'armor_stand': serialize_meta_armor_stand,
+    'knowledge_book': serialize_meta_knowledge_book,
+    'block_state': serialize_meta_block_state,
+    'tropical_fish_bucket': serialize_meta_tropical_fish_bucket,
+    'axolotl_bucket': serialize_meta_axolotl_bucket,
+    'crossbow': serialize_meta_crossbow,
+    'suspicious_stew': serialize_meta_suspicious_stew,
+    'entity_tag': serialize_meta_entity_tag,
+    'compass': serialize_meta_compass,
+    'bundle': serialize_meta_bundle,
+    'music_instrument': serialize_meta_music_instrument,
+}
+
+# Material name -> serialize meta function added by register_meta_serializer, used before the table set's meta kind
+meta_serializers = {}
+# Serialize meta functions which also need the item material as second argument
+item_type_serializers = {serialize_meta_block_state}
+# Used for materials without a registered serializer
+default_meta_serializer = serialize_meta_item
+
+
+def register_meta_serializer(item_types, serialize_fn, pass_item_type=False):
+    # Add or override serialize meta function for the given materials (e.g. new game version items)
+    if isinstance(item_types, str):
+        item_types = (item_types,)
+    for item_type in item_types:
+        meta_serializers[item_type] = serialize_fn
+    if pass_item_type:
+        item_type_serializers.add(serialize_fn)
 
-    for item_types, fn in funcs_map.items():
-        if item_type in item_types:
-            return fn
-    return serialize_meta_item  # default serialize meta function
+
+def serialize_meta_fn(item_type: str) -> ():
+    serialize_fn = meta_serializers.get(item_type)
+    if serialize_fn is None:
+        serialize_fn = META_SERIALIZERS.get(tables.current().meta_kinds.get(item_type), default_meta_serializer)
+    return serialize_fn
 
 
 def get_item_meta(item_type, meta_item_tag):
     serialize_fn = serialize_meta_fn(item_type)
-    if serialize_fn is serialize_meta_block_state:
+    if serialize_fn in item_type_serializers:
         meta = serialize_fn(meta_item_tag, item_type)
     else:
         meta = serialize_fn(meta_item_tag)
     return meta
 
 
+class FrozenDict(dict):
+    # Cached results are shared between inventories, so they must not be changed in place
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('cached item stack is read-only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # Unpickling a dict subclass fills it with __setitem__
+        return FrozenDict, (dict(self),)
+
+
+def freeze(obj):
+    if isinstance(obj, dict) and not isinstance(obj, FrozenDict):
+        return FrozenDict((key, freeze(value)) for key, value in obj.items())
+    if isinstance(obj, list):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+
+class ItemCache:
+    # LRU of serialized item stacks keyed by hash of the item's raw NBT.
+    # Entry cost is estimated from the raw NBT size, so max_bytes is an approximate memory cap.
+    # Locked, so library callers can share it between threads.
+    ENTRY_OVERHEAD = 512
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, item_data, cost):
+        item_data = freeze(item_data)
+        cost += self.ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return item_data
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = (item_data, cost)
+                self.size += cost
+            while self.size > self.max_bytes:
+                _, (_, evicted_cost) = self.entries.popitem(last=False)
+                self.size -= evicted_cost
+        return item_data
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.size}
+
+
+item_cache = None
+
+
+def enable_item_cache(max_bytes=64 << 20):
+    global item_cache
+    item_cache = ItemCache(max_bytes) if max_bytes > 0 else None
+
+
+def item_cache_key(item_tag):
+    # Slot is not a part of the serialized stack, so equal stacks in different slots share the entry.
+    # Returns key and entry cost, or None for tags without source bytes (e.g. built with the nbt library).
+    # The DataVersion is a part of the key, the stack's 'v' and tables depend on it.
+    data_version = tables.current().data_version
+    meta_item_tag = item_tag.get('tag')
+    if meta_item_tag is None:
+        return (data_version, item_tag['id'].value, item_tag['Count'].value, None), 0
+    if not isinstance(meta_item_tag, nbtreader.Node):
+        return None
+    raw = meta_item_tag.raw()
+    digest = hashlib.blake2b(raw, digest_size=16).digest()
+    return (data_version, item_tag['id'].value, item_tag['Count'].value, digest), len(raw)
+
+
 def serialize_item_stack(item_tag):
+    if item_cache is None:
+        return serialize_item_stack_nocache(item_tag)
+    key = item_cache_key(item_tag)
+    if key is None:
+        return serialize_item_stack_nocache(item_tag)
+    key, cost = key
+    item_data = item_cache.get(key)
+    if item_data is None:
+        item_data = item_cache.put(key, serialize_item_stack_nocache(item_tag), cost)
+    return item_data
+
+
+# Meta keys which serialize_meta_* functions fill with nested item stack tags (bundle items, crossbow projectiles)
+NESTED_ITEMS_KEYS = ('items', 'charged-projectiles')
+# Limits for griefed or modded containers, a hit fails the file instead of the whole worker
+MAX_NESTING_DEPTH = 16
+MAX_NESTED_ITEMS = 4096
+
+
+class NestingLimitError(ValueError):
+    pass
+
+
+def serialize_item_stack_nocache(item_tag):
+    # Nested item stacks are serialized from an explicit work stack instead of recursion
+    item_data = serialize_single_item_stack(item_tag)
+    work = [(item_data, 0)]
+    nested_items = 0
+    while work:
+        parent, depth = work.pop()
+        meta = parent.get('meta')
+        if meta is None:
+            continue
+        for key in NESTED_ITEMS_KEYS:
+            nested = meta.get(key)
+            if not nested:
+                continue
+            if depth >= MAX_NESTING_DEPTH:
+                raise NestingLimitError(f"{item_data['type']} has items nested deeper than {MAX_NESTING_DEPTH} levels")
+            nested_items += len(nested)
+            if nested_items > MAX_NESTED_ITEMS:
+                raise NestingLimitError(f"{item_data['type']} holds more than {MAX_NESTED_ITEMS} nested items")
+            for index, nested_tag in enumerate(nested):
+                nested[index] = child = serialize_single_item_stack(nested_tag)
+                work.append((child, depth + 1))
+    return item_data
+
+
+def count_item_stacks(item_data):
+    # The stack and every stack nested in it, also for cached stacks whose nested items were not serialized again
+    count = 0
+    work = [item_data]
+    while work:
+        item_data = work.pop()
+        count += 1
+        meta = item_data.get('meta')
+        if meta is not None:
+            for key in NESTED_ITEMS_KEYS:
+                work.extend(meta.get(key, ()))
+    return count
+
+
+def serialize_single_item_stack(item_tag):
     # https://hub.spigotmc.org/stash/projects/SPIGOT/repos/bukkit/browse/src/main/java/org/bukkit/inventory/ItemStack.java#466
     item_data = {
         '==': 'org.bukkit.inventory.ItemStack',
-        'v': BUKKIT_VERSION,
+        'v': tables.current().item_version,
         'type': item_tag['id'].value.split(':')[1].upper(),
     }
 
@@ -563,109 +668,557 @@ def serialize_item_stack(item_tag):
     return item_data
 
 
+# Root tags of player.dat read by serialize_player_nbt and convert_file, the rest is skipped on load
+PLAYER_TAGS = frozenset((
+    'playerGameType', 'Inventory', 'EnderItems', 'Dimension', 'Pos', 'Rotation',
+    'SpawnDimension', 'SpawnX', 'SpawnY', 'SpawnZ', 'SpawnAngle', 'ActiveEffects',
+    'foodExhaustionLevel', 'foodLevel', 'XpLevel', 'XpP', 'Health', 'XpTotal', 'FallDistance', 'Fire',
+    'foodSaturationLevel', 'Air', 'bukkit', 'DataVersion',
+))
+
+
 def serialize_player_nbt(player_nbt, mv_world):
     # https://github.com/Multiverse/Multiverse-Inventories/blob/main/src/main/java/com/onarandombox/multiverseinventories/share/Sharables.java
-    game_mode = GAME_MODES[player_nbt['playerGameType'].value]
-
-    # Build default empty json structure
-    json_data = {
-        game_mode: {
-            'inventoryContents': {},
-            'offHandItem': {
-                "==": "org.bukkit.inventory.ItemStack",
-                "v": BUKKIT_VERSION,
-                "type": "AIR",
-                "amount": 0
-            },
-            'potions': [],
-            'enderChestContents': {},
-            'armorContents': {},
+    # Items and locations are read with the tables of the game version which saved the file
+    data_version = player_nbt['DataVersion'].value if 'DataVersion' in player_nbt else None
+    with tables.using(data_version) as table_set:
+        game_mode = GAME_MODES[player_nbt['playerGameType'].value]
+
+        # Build default empty json structure
+        json_data = {
+            game_mode: {
+                'inventoryContents': {},
+                'offHandItem': {
+                    "==": "org.bukkit.inventory.ItemStack",
+                    "v": table_set.item_version,
+                    "type": "AIR",
+                    "amount": 0
+                },
+                'potions': [],
+                'enderChestContents': {},
+                'armorContents': {},
+            }
         }
-    }
 
-    # Parse inventory
-    for tag in player_nbt['Inventory']:
-        slot = tag['Slot'].value
-        if slot >= 100:
-            json_data[game_mode]['armorContents'][str(slot - 100)] = serialize_item_stack(tag)
-        elif slot == -106:
-            json_data[game_mode]['offHandItem'] = serialize_item_stack(tag)
-        else:
-            json_data[game_mode]['inventoryContents'][str(slot)] = serialize_item_stack(tag)
+        # Parse inventory
+        for tag in player_nbt['Inventory']:
+            slot = tag['Slot'].value
+            if slot >= 100:
+                json_data[game_mode]['armorContents'][str(slot - 100)] = serialize_item_stack(tag)
+            elif slot == -106:
+                json_data[game_mode]['offHandItem'] = serialize_item_stack(tag)
+            else:
+                json_data[game_mode]['inventoryContents'][str(slot)] = serialize_item_stack(tag)
+
+        # Parse Ender chest
+        for tag in player_nbt['EnderItems']:
+            json_data[game_mode]['enderChestContents'][str(tag['Slot'].value)] = serialize_item_stack(tag)
+
+        dimensions = table_set.dimensions
+        # No SpawnDimension before 1.16, the spawn point was always in the overworld
+        spawn_world = mv_world
+        if 'SpawnDimension' in player_nbt:
+            spawn_world += dimensions[player_nbt['SpawnDimension'].value]
+
+        # Parse last location
+        json_data[game_mode]['lastLocation'] = {
+            '==': 'org.bukkit.Location',
+            'world': mv_world + dimensions[player_nbt['Dimension'].value],
+            'x': player_nbt['Pos'][0].value,
+            'y': player_nbt['Pos'][1].value,
+            'z': player_nbt['Pos'][2].value,
+            'pitch': player_nbt['Rotation'][0].value,
+            'yaw': player_nbt['Rotation'][1].value,
+        }
 
-    # Parse Ender chest
-    for tag in player_nbt['EnderItems']:
-        json_data[game_mode]['enderChestContents'][str(tag['Slot'].value)] = serialize_item_stack(tag)
+        # Parse spawn location
+        json_data[game_mode]['bedSpawnLocation'] = {
+            '==': 'org.bukkit.Location',
+            'world': spawn_world,
+            'x': player_nbt['SpawnX'].value,
+            'y': player_nbt['SpawnY'].value,
+            'z': player_nbt['SpawnZ'].value,
+            'pitch': 0,
+            'yaw': player_nbt['SpawnAngle'].value
+        }
 
-    dimensions = {
-        'minecraft:overworld': '',
-        'minecraft:the_nether': '_nether',
-        'minecraft:the_end': '_the_end',
-    }
+        # Parse potion effects
+        if 'ActiveEffects' in player_nbt:
+            json_data[game_mode]['potions'] = [serialize_potion_effect(effect)
+                                               for effect in player_nbt['ActiveEffects']]
+
+        # Parse stats
+        json_data[game_mode]['stats'] = {
+            'ex': player_nbt['foodExhaustionLevel'].valuestr(),  # Float
+            'ma': '300',  # Integer (max air)
+            'fl': player_nbt['foodLevel'].valuestr(),  # Integer
+            'el': player_nbt['XpLevel'].valuestr(),  # Integer
+            'xp': player_nbt['XpP'].valuestr(),  # Float
+            'hp': player_nbt['Health'].valuestr(),  # Double
+            'txp': player_nbt['XpTotal'].valuestr(),  # Integer
+            'fd': player_nbt['FallDistance'].valuestr(),  # Float
+            'ft': player_nbt['Fire'].valuestr(),  # Integer
+            'sa': player_nbt['foodSaturationLevel'].valuestr(),  # Float
+            'ra': player_nbt['Air'].valuestr(),  # Integer
+        }
 
-    # Parse last location
-    json_data[game_mode]['lastLocation'] = {
-        '==': 'org.bukkit.Location',
-        'world': mv_world + dimensions[player_nbt['Dimension'].value],
-        'x': player_nbt['Pos'][0].value,
-        'y': player_nbt['Pos'][1].value,
-        'z': player_nbt['Pos'][2].value,
-        'pitch': player_nbt['Rotation'][0].value,
-        'yaw': player_nbt['Rotation'][1].value,
-    }
+        return json_data
 
-    # Parse spawn location
-    json_data[game_mode]['bedSpawnLocation'] = {
-        '==': 'org.bukkit.Location',
-        'world': mv_world + dimensions[player_nbt['SpawnDimension'].value],
-        'x': player_nbt['SpawnX'].value,
-        'y': player_nbt['SpawnY'].value,
-        'z': player_nbt['SpawnZ'].value,
-        'pitch': 0,
-        'yaw': player_nbt['SpawnAngle'].value
-    }
 
-    # Parse potion effects
-    if 'ActiveEffects' in player_nbt:
-        json_data[game_mode]['potions'] = [serialize_potion_effect(effect) for effect in player_nbt['ActiveEffects']]
-
-    # Parse stats
-    json_data[game_mode]['stats'] = {
-        'ex': player_nbt['foodExhaustionLevel'].valuestr(),  # Float
-        'ma': '300',  # Integer (max air)
-        'fl': player_nbt['foodLevel'].valuestr(),  # Integer
-        'el': player_nbt['XpLevel'].valuestr(),  # Integer
-        'xp': player_nbt['XpP'].valuestr(),  # Float
-        'hp': player_nbt['Health'].valuestr(),  # Double
-        'txp': player_nbt['XpTotal'].valuestr(),  # Integer
-        'fd': player_nbt['FallDistance'].valuestr(),  # Float
-        'ft': player_nbt['Fire'].valuestr(),  # Integer
-        'sa': player_nbt['foodSaturationLevel'].valuestr(),  # Float
-        'ra': player_nbt['Air'].valuestr(),  # Integer
-    }
+class JsonFolder:
+    # <lastKnownName>.json files in one directory
+    def __init__(self, output_dir='.'):
+        self.output_dir = output_dir
 
-    return json_data
+    def write(self, json_data, name):
+        path = os.path.join(self.output_dir, name + '.json')
+        write_json(json_data, path)
+        return path
 
+    def remove(self, path):
+        # Returns the files left in place
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return []
 
-def main(player_filename, mv_world='world'):
-    player = nbt.nbt.NBTFile(player_filename, 'rb')
 
+def make_output(output):
+    # Directory name or an output object with write(json_data, name) -> path and remove(path) -> kept files,
+    # like mvinv.DataFolder
+    return JsonFolder(output) if isinstance(output, str) else output
+
+
+def serialize_player(player, mv_world='world'):
+    # Returns player name and serialized json data
     json_data = serialize_player_nbt(player, mv_world)
 
     # Get player name
     name = player['bukkit']['lastKnownName'].value
+    return name, json_data
+
+
+def read_player(player_filename, mv_world='world'):
+    return serialize_player(nbtreader.load(player_filename, PLAYER_TAGS), mv_world)
+
+
+def convert_bytes(data, mv_world='world'):
+    # Library entry point: player.dat content (gzipped or not) as bytes or a binary file object -> (name, json_data).
+    # Touches no files and changes no module settings, so threads of a long-lived process can share it.
+    # Item stacks are read-only dicts when configure() enabled the item cache.
+    if hasattr(data, 'read'):
+        data = data.read()
+    return serialize_player(nbtreader.loads(data, PLAYER_TAGS), mv_world)
+
+
+def convert_bytes_json(data, mv_world='world'):
+    # Same as convert_bytes with the json encoded into the bytes convert_file would write
+    name, json_data = convert_bytes(data, mv_world)
+    return name, json.dumps(json_data).encode('utf-8')
+
+
+def blob_task(data, mv_world, encode):
+    result, error = run_guarded(convert_bytes_json if encode else convert_bytes, data, mv_world)
+    name, value = result or (None, None)
+    return name, value, error
+
 
-    with open(name + '.json', 'w') as out_file:
-        json.dump(json_data, out_file)
+def convert_blobs(blobs, mv_world='world', encode=False, executor=None):
+    # Batch of convert_bytes (convert_bytes_json if encode) returning [(name, value, error), ...] in blobs order.
+    # A corrupt blob gets an error message instead of raising. An executor (e.g. a long-lived ProcessPoolExecutor)
+    # spreads the blobs over its workers, without one they are converted in the calling thread.
+    if executor is None:
+        return [blob_task(data, mv_world, encode) for data in blobs]
+    blobs = [data.read() if hasattr(data, 'read') else data for data in blobs]
+    return list(executor.map(blob_task, blobs, itertools.repeat(mv_world), itertools.repeat(encode)))
+
+
+def convert_file(player_filename, mv_world='world', output='.'):
+    # Returns the written file path
+    name, json_data = read_player(player_filename, mv_world)
+    return make_output(output).write(json_data, name)
+
+
+def convert_file_entry(player_filename, mv_world='world', output='.'):
+    # convert_file returning the manifest entry of the file, hashed from the bytes that were parsed instead of reading
+    # the file again. Stat first: a file rewritten in between gets an older mtime, so the next incremental run
+    # converts it again.
+    import manifest
+    stat = os.stat(player_filename)
+    digest = hashlib.sha256()
+    name, json_data = serialize_player(nbtreader.load(player_filename, PLAYER_TAGS, digest=digest), mv_world)
+    path = make_output(output).write(json_data, name)
+    return manifest.make_entry(stat, digest.hexdigest(), path, CONVERTER_VERSION)
+
+
+def write_json(json_data, filename):
+    # Encoded in one go (json.dump streams small chunks from the slower pure Python encoder) and written with one call
+    data = json.dumps(json_data).encode('utf-8')
+    with open(filename, 'wb') as out_file:
+        out_file.write(data)
+
+
+def main(player_filename, mv_world='world'):
+    convert_file(player_filename, mv_world)
+
+
+def find_player_files(source):
+    # Accepts a playerdata directory, a glob pattern or a single file
+    import glob
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '*.dat')))
+    return sorted(glob.glob(source))
+
+
+profile = None
+
+
+def enable_profiling():
+    # Wraps the stage functions with counters, so disabled profiling costs nothing
+    global profile, serialize_player_nbt, serialize_item_stack, encode_internal, write_json, convert_file, ndjson_line
+    global convert_file_entry
+    global default_meta_serializer
+    if profile is not None:
+        return
+    profile = profiling.Profile()
+    nbtreader.load = profile.timed('parse', nbtreader.load)
+    nbtreader.loads = profile.timed('parse', nbtreader.loads)
+    serialize_player_nbt = profile.timed('serialize_player_nbt', serialize_player_nbt)
+    serialize_item_stack = profile.counted(serialize_item_stack, count_item_stacks)
+    encode_internal = profile.timed('encode_internal', encode_internal)
+    write_json = profile.timed('write_json', write_json)
+    import mvinv
+    mvinv.write_json_atomic = profile.timed('write_json', mvinv.write_json_atomic)
+    convert_file = profile.per_file(convert_file)
+    ndjson_line = profile.per_file(ndjson_line)
+    convert_file_entry = profile.per_file(convert_file_entry)
+
+    wrapped = {}
+    for serialize_fn in set(META_SERIALIZERS.values()) | set(meta_serializers.values()) | {default_meta_serializer}:
+        wrapped[serialize_fn] = profile.timed(serialize_fn.__name__, serialize_fn)
+        if serialize_fn in item_type_serializers:
+            item_type_serializers.add(wrapped[serialize_fn])
+    for kind, serialize_fn in META_SERIALIZERS.items():
+        META_SERIALIZERS[kind] = wrapped[serialize_fn]
+    for item_type, serialize_fn in meta_serializers.items():
+        meta_serializers[item_type] = wrapped[serialize_fn]
+    default_meta_serializer = wrapped[default_meta_serializer]
+
+
+def configure(item_cache_bytes=0, profile_stages=False, max_nesting_depth=None, max_nested_items=None,
+              usercache=None):
+    global MAX_NESTING_DEPTH, MAX_NESTED_ITEMS
+    enable_item_cache(item_cache_bytes)
+    if usercache:
+        playerprofile.set_usercache(playerprofile.load_usercache(usercache))
+    if profile_stages:
+        enable_profiling()
+    if max_nesting_depth is not None:
+        MAX_NESTING_DEPTH = max_nesting_depth
+    if max_nested_items is not None:
+        MAX_NESTED_ITEMS = max_nested_items
+
+
+def init_worker(options):
+    # Pool initializer, options are configure() arguments
+    configure(**(options or {}))
+
+
+def worker_stats():
+    # Cumulative counters of this process, the batch keeps the last snapshot per worker
+    stats = {'pid': os.getpid()}
+    if item_cache is not None:
+        stats['item_cache'] = item_cache.stats()
+    if profile is not None:
+        stats['profile'] = profile.to_dict()
+    return stats
+
+
+def error_message(e):
+    return f'{type(e).__name__}: {e}'
+
+
+def run_guarded(fn, *args):
+    # Pool tasks never raise, so one corrupt .dat can't abort the whole batch: returns (result, error)
+    try:
+        return fn(*args), None
+    except Exception as e:
+        return None, error_message(e)
+
+
+def convert_task(player_filename, mv_world, output):
+    return (player_filename, *run_guarded(convert_file, player_filename, mv_world, output), worker_stats())
+
+
+def entry_task(player_filename, mv_world, output):
+    # convert_task with the manifest entry of the file as result, see convert_file_entry
+    return (player_filename, *run_guarded(convert_file_entry, player_filename, mv_world, output), worker_stats())
+
+
+def future_result(future, player_filename):
+    # Worker crashes (e.g. BrokenProcessPool) surface here instead of inside the task
+    result, error = run_guarded(future.result)
+    return result if error is None else (player_filename, None, error, None)
+
+
+def run_tasks(task, player_filenames, task_args=(), workers=None, max_in_flight=None, ordered=False,
+              worker_options=None):
+    # Yields task(player_filename, *task_args) results, at most max_in_flight files are queued in the pool.
+    # Results come in player_filenames order if ordered, as completed otherwise.
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    if workers == 1:
+        init_worker(worker_options)
+        for player_filename in player_filenames:
+            yield task(player_filename, *task_args)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(worker_options,)) as executor:
+        in_flight = {}  # future -> player filename, in submission order
+        for player_filename in player_filenames:
+            if len(in_flight) >= max_in_flight:
+                if ordered:
+                    done = (next(iter(in_flight)),)
+                else:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future_result(future, in_flight.pop(future))
+            in_flight[executor.submit(task, player_filename, *task_args)] = player_filename
+        while in_flight:
+            if ordered:
+                done = (next(iter(in_flight)),)
+            else:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future_result(future, in_flight.pop(future))
+
+
+class BatchResults:
+    # Collects (player filename, value, error, worker stats) task results
+    def __init__(self):
+        self.converted = {}
+        self.failures = []
+        self.stats_by_worker = {}
+        self.start = time.perf_counter()
+
+    def add(self, result, keep=True):
+        # Returns the task value, None on error
+        player_filename, value, error, stats = result
+        if stats is not None:
+            self.stats_by_worker[stats['pid']] = stats
+        if error is not None:
+            self.failures.append((player_filename, error))
+            return None
+        self.converted[player_filename] = value if keep else None
+        return value
+
+    def finish(self, stats_json=None):
+        stats = list(self.stats_by_worker.values())
+        print_summary(self.converted, self.failures, time.perf_counter() - self.start, stats)
+        profiles = [worker['profile'] for worker in stats if 'profile' in worker]
+        if profiles:
+            report_profile(profiling.merge(profiles), stats_json)
+
+
+def batch(player_filenames, mv_world='world', output='.', workers=None, max_in_flight=None, worker_options=None,
+          stats_json=None, task=convert_task):
+    # Returns ({player filename: task value}, [(player filename, error)]), the value is the written file path of
+    # convert_task or the manifest entry of entry_task
+    if isinstance(output, str):
+        os.makedirs(output, exist_ok=True)
+    results = BatchResults()
+    for result in run_tasks(task, player_filenames, (mv_world, output), workers, max_in_flight,
+                            worker_options=worker_options):
+        results.add(result)
+    results.finish(stats_json)
+    return results.converted, results.failures
+
+
+def ndjson_line(player_filename, mv_world='world'):
+    name, json_data = read_player(player_filename, mv_world)
+    return json.dumps({
+        'uuid': os.path.splitext(os.path.basename(player_filename))[0],
+        'name': name,
+        'data': json_data,
+    })
+
+
+def ndjson_task(player_filename, mv_world):
+    return (player_filename, *run_guarded(ndjson_line, player_filename, mv_world), worker_stats())
+
+
+def export_ndjson(player_filenames, out_file, mv_world='world', workers=None, ordered=True, max_in_flight=None,
+                  worker_options=None, stats_json=None):
+    # One json line per player ({"uuid", "name", "data"}), streamed as results come, so memory use doesn't grow
+    # with the number of players
+    results = BatchResults()
+    for result in run_tasks(ndjson_task, player_filenames, (mv_world,), workers, max_in_flight, ordered,
+                            worker_options):
+        line = results.add(result, keep=False)
+        if line is not None:
+            out_file.write(line)
+            out_file.write('\n')
+    out_file.flush()
+    results.finish(stats_json)
+    return results.converted, results.failures
+
+
+def report_profile(profile_data, stats_json=None):
+    if stats_json:
+        with open(stats_json, 'w') as out_file:
+            json.dump(profile_data, out_file, indent=1)
+    else:
+        print(profiling.format_report(profile_data), file=sys.stderr)
+
+
+def incremental_batch(player_filenames, manifest_path, mv_world='world', output='.', **batch_args):
+    # Converts only files which are new or changed since the run recorded in the manifest
+    import manifest
+    data = manifest.load(manifest_path)
+    files = data.setdefault('files', {})
+    changed, orphaned = manifest.plan(player_filenames, files, CONVERTER_VERSION)
+    print(f'{len(changed)} new or changed, {len(player_filenames) - len(changed)} unchanged, '
+          f'{len(orphaned)} removed file(s)', file=sys.stderr)
+
+    removed = list(orphaned.values())
+    for player_filename in orphaned:
+        del files[player_filename]
+
+    converted, failures = batch(changed, mv_world, output, task=entry_task, **batch_args)
+    for player_filename, entry in converted.items():
+        previous = files.get(player_filename)
+        if previous is not None and previous['output'] != entry['output']:
+            removed.append(previous)  # renamed player
+        files[player_filename] = entry
+
+    kept = manifest.remove_outputs(files, removed, make_output(output).remove)
+    if kept:
+        print(f'{len(kept)} profile file(s) of removed or renamed players kept, clean them up by hand if needed:',
+              file=sys.stderr)
+        for path in kept:
+            print(f'  {path}', file=sys.stderr)
+    manifest.save(manifest_path, data)
+    return converted, failures
+
+
+def print_summary(converted, failures, elapsed, stats=()):
+    total = len(converted) + len(failures)
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f'Converted {len(converted)}/{total} files in {elapsed:.2f}s ({rate:.1f} files/s), {len(failures)} failed',
+          file=sys.stderr)
+    caches = [worker['item_cache'] for worker in stats if 'item_cache' in worker]
+    if caches:
+        hits = sum(cache['hits'] for cache in caches)
+        lookups = hits + sum(cache['misses'] for cache in caches)
+        hit_rate = hits / lookups * 100 if lookups else 0.0
+        print(f'Item cache: {hits}/{lookups} hits ({hit_rate:.1f}%), '
+              f'{sum(cache["entries"] for cache in caches)} entries, '
+              f'{sum(cache["bytes"] for cache in caches) / (1 << 20):.1f} MiB in {len(caches)} worker(s)',
+              file=sys.stderr)
+    for player_filename, error in failures:
+        print(f'  {player_filename}: {error}', file=sys.stderr)
+
+
+def parse_args(argv=None):
+    import argparse
+    import shards
+    parser = argparse.ArgumentParser(description='Convert vanilla player.dat files into Multiverse-Inventories json')
+    parser.add_argument('source', help='player.dat file, playerdata directory or glob pattern')
+    parser.add_argument('world', nargs='?', default='world', help="Multiverse world(overworld) name, 'world' by default")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes for batch conversion, cpu count by default')
+    parser.add_argument('-o', '--output-dir', default='.', help='directory for the created .json files')
+    parser.add_argument('--mv-data', metavar='DIR',
+                        help='write into a Multiverse-Inventories data folder (players/, worlds/<world>/) '
+                             'instead of -o, merging with existing profiles')
+    parser.add_argument('--mv-group', metavar='GROUP', help='also write profiles into groups/GROUP/ of --mv-data')
+    parser.add_argument('--usercache', metavar='FILE',
+                        help="server's usercache.json, fills in missing skull owner names and uuids")
+    parser.add_argument('--item-cache', type=int, default=0, metavar='MB',
+                        help='memoize serialized item stacks using up to MB megabytes per worker, disabled by default')
+    parser.add_argument('--max-nesting-depth', type=int, default=None,
+                        help=f'max depth of items nested in bundles and crossbows, {MAX_NESTING_DEPTH} by default')
+    parser.add_argument('--max-nested-items', type=int, default=None,
+                        help=f'max number of items nested in one item stack, {MAX_NESTED_ITEMS} by default')
+    parser.add_argument('--stats', action='store_true',
+                        help='print call counts and time per stage and per meta serializer at the end of the run')
+    parser.add_argument('--stats-json', metavar='FILE', help='write --stats counters into a json FILE instead')
+    parser.add_argument('--ndjson', metavar='FILE',
+                        help="write one json line per player into FILE ('-' for stdout) instead of json files")
+    parser.add_argument('--unordered', action='store_true',
+                        help='--ndjson lines in order of completion instead of sorted by file name')
+    parser.add_argument('--incremental', metavar='MANIFEST',
+                        help='convert only new or changed files, tracked in the MANIFEST json file')
+    parser.add_argument('--shard', type=shards.parse_shard, metavar='I/N',
+                        help='convert only the files of shard I (0 <= I < N) picked by a hash of the file name')
+    parser.add_argument('--shard-manifest', metavar='FILE',
+                        help='manifest of the converted files and errors of --shard, shard-I-of-N.json by default')
+    args = parser.parse_args(argv)
+    if args.shard and args.ndjson:
+        # The shard manifest records written json files, an NDJSON export has none to merge
+        parser.error('argument --shard: not allowed with argument --ndjson')
+    return args
 
 
 def test():
-    player = nbt.nbt.NBTFile('76121406-7ac6-32c8-90ee-2368a675ad02.dat', 'rb')
+    player = nbtreader.load('76121406-7ac6-32c8-90ee-2368a675ad02.dat', PLAYER_TAGS)
     result = serialize_player_nbt(player, 'world')
     print(result)
 
 
 if __name__ == '__main__':
     # test()
-    world = sys.argv[2] if len(sys.argv) > 2 else 'world'
-    main(sys.argv[1], world)
+    args = parse_args()
+    profile_stages = args.stats or bool(args.stats_json)
+    worker_options = {
+        'item_cache_bytes': args.item_cache << 20,
+        'profile_stages': profile_stages,
+        'max_nesting_depth': args.max_nesting_depth,
+        'max_nested_items': args.max_nested_items,
+        'usercache': args.usercache,
+    }
+    batch_args = {'workers': args.workers, 'worker_options': worker_options, 'stats_json': args.stats_json}
+    output = args.output_dir
+    if args.mv_data:
+        import mvinv
+        output = mvinv.DataFolder(args.mv_data, args.world, args.mv_group)
+    if os.path.isfile(args.source) and not (args.incremental or args.ndjson):
+        configure(**worker_options)
+        convert_file(args.source, args.world, output)
+        if profile_stages:
+            report_profile(profile.to_dict(), args.stats_json)
+        sys.exit(0)
+
+    listing = player_filenames = find_player_files(args.source)
+    if args.shard:
+        import manifest
+        import shards
+        player_filenames = shards.select(listing, *args.shard)
+    if args.ndjson:
+        if args.ndjson == '-':
+            _, failed = export_ndjson(player_filenames, sys.stdout, args.world, ordered=not args.unordered,
+                                      **batch_args)
+        else:
+            with open(args.ndjson, 'w', buffering=1 << 20) as ndjson_file:
+                _, failed = export_ndjson(player_filenames, ndjson_file, args.world, ordered=not args.unordered,
+                                          **batch_args)
+        sys.exit(1 if failed else 0)
+    elif args.incremental:
+        _, failed = incremental_batch(player_filenames, args.incremental, args.world, output, **batch_args)
+    else:
+        # A shard records the manifest entries its workers computed from the converted bytes
+        converted, failed = batch(player_filenames, args.world, output, task=entry_task if args.shard else convert_task,
+                                  **batch_args)
+    if args.shard:
+        if args.incremental:
+            files = manifest.load(args.incremental).get('files', {})
+            entries = {player_filename: files[player_filename] for player_filename in player_filenames
+                       if player_filename in files}
+        else:
+            entries = converted
+        shards.write_manifest(args.shard_manifest or shards.default_manifest_path(*args.shard), args.shard, listing,
+                              entries, failed, CONVERTER_VERSION)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import queue
+import signal
+import socket
+import argparse
+import threading
+import socketserver
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import convert
+import mvinv
+
+# Warm conversion server on a Unix socket:
+#   python ./daemon.py [--socket PATH] [-j WORKERS] [--item-cache MB] [--usercache FILE]
+# Requests and responses are json lines, one response per request in request order:
+#   {"path": "/abs/player.dat", "world": "world"}                        -> {"ok": true, "name": ..., "data": {...}}
+#   {"path": ..., "world": ..., "output": "/abs/dir"}                     -> {"ok": true, "path": "/abs/dir/name.json"}
+#   {"path": ..., "world": ..., "mv_data": "/abs/mv", "mv_group": null}   -> {"ok": true, "path": ...}
+#   any failure                                                           -> {"ok": false, "error": ...}
+# See daemon_client.py for the command line client.
+
+DEFAULT_SOCKET = 'nbt2mvi.sock'
+# Requests of one connection queued in the pool before reading more of them
+MAX_IN_FLIGHT_PER_CONNECTION = 64
+
+
+def error_response(error):
+    return json.dumps({'ok': False, 'error': error})
+
+
+def json_response(player_filename, mv_world):
+    name, json_data = convert.read_player(player_filename, mv_world)
+    return json.dumps({'ok': True, 'name': name, 'data': json_data})
+
+
+def json_task(player_filename, mv_world):
+    # Runs in a pool worker, the response is encoded there
+    response, error = convert.run_guarded(json_response, player_filename, mv_world)
+    return response if error is None else error_response(error)
+
+
+def write_task(player_filename, mv_world, output):
+    if isinstance(output, str):
+        os.makedirs(output, exist_ok=True)
+    _, path, error, _ = convert.convert_task(player_filename, mv_world, output)
+    if error is not None:
+        return error_response(error)
+    return json.dumps({'ok': True, 'path': path})
+
+
+def submit(executor, line):
+    # Returns a future of the response line
+    try:
+        request = json.loads(line)
+        player_filename = request['path']
+        mv_world = request.get('world') or 'world'
+        if request.get('mv_data'):
+            output = mvinv.DataFolder(request['mv_data'], mv_world, request.get('mv_group'))
+        else:
+            output = request.get('output')
+    except (ValueError, TypeError, KeyError) as e:
+        return completed(error_response(f'Bad request: {convert.error_message(e)}'))
+    if output is None:
+        return executor.submit(json_task, player_filename, mv_world)
+    return executor.submit(write_task, player_filename, mv_world, output)
+
+
+def completed(value):
+    # Future of a response known without the pool
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # Requests are read and submitted while a writer thread sends finished responses in order
+        pending = queue.Queue(MAX_IN_FLIGHT_PER_CONNECTION)
+        writer = threading.Thread(target=self.write_responses, args=(pending,), daemon=True)
+        writer.start()
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    pending.put(submit(self.server.executor, line))
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def write_responses(self, pending):
+        broken = False
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            # Worker crashes (e.g. BrokenProcessPool) surface here
+            response, error = convert.run_guarded(future.result)
+            if error is not None:
+                response = error_response(error)
+            if broken:
+                continue  # keep draining, so the reader never blocks on a full queue
+            try:
+                self.wfile.write(response.encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                broken = True
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, executor):
+        self.executor = executor
+        super().__init__(socket_path, RequestHandler)
+
+
+def remove_stale_socket(socket_path):
+    # A socket file left by a killed daemon refuses connections, a live one accepts them
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    raise OSError(f'Daemon already listening on {socket_path}')
+
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None, worker_options=None):
+    workers = workers or os.cpu_count() or 1
+    remove_stale_socket(socket_path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=convert.init_worker,
+                             initargs=(worker_options,)) as executor:
+        # Start every worker up front, so the first requests don't pay for process start and imports
+        for future in [executor.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+        server = Server(socket_path, executor)
+        try:
+            print(f'Listening on {socket_path} with {workers} worker(s)', file=sys.stderr)
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve player.dat conversions on a Unix socket')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f'socket path, {DEFAULT_SOCKET} by default')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--item-cache', type=int, default=0, metavar='MB',
+                        help='memoize serialized item stacks using up to MB megabytes per worker')
+    parser.add_argument('--usercache', metavar='FILE',
+                        help="server's usercache.json, fills in missing skull owner names and uuids")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # SIGTERM unwinds serve() like Ctrl+C, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    worker_options = {'item_cache_bytes': args.item_cache << 20, 'usercache': args.usercache}
+    try:
+        serve(args.socket, args.workers, worker_options)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
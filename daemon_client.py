@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import threading
+
+# Thin client of daemon.py, imports nothing of the converter so it starts fast:
+#   python ./daemon_client.py [PLAYER.DAT ...] [-w WORLD] [-o DIR | --mv-data DIR [--mv-group GROUP]] [--socket PATH]
+# Without player files the paths are read from stdin, one per line. Prints the json of each player (one line each)
+# or, with -o/--mv-data, the written file paths. Failures go to stderr and make the exit code 1.
+
+DEFAULT_SOCKET = 'nbt2mvi.sock'
+
+
+def make_request(player_filename, args):
+    request = {'path': os.path.abspath(player_filename), 'world': args.world}
+    if args.mv_data:
+        request['mv_data'] = os.path.abspath(args.mv_data)
+        request['mv_group'] = args.mv_group
+    elif args.output_dir:
+        request['output'] = os.path.abspath(args.output_dir)
+    return request
+
+
+def send_requests(sock, player_filenames, args):
+    # Separate thread: responses are read while requests are still being sent
+    try:
+        with sock.makefile('wb') as out_file:
+            for player_filename in player_filenames:
+                out_file.write(json.dumps(make_request(player_filename, args)).encode('utf-8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass  # the daemon closed the connection, main() reports the unanswered files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Convert player.dat files with a running daemon.py')
+    parser.add_argument('files', nargs='*', help='player.dat files, read from stdin if none')
+    parser.add_argument('-w', '--world', default='world',
+                        help="Multiverse world(overworld) name, 'world' by default (an option here, positional "
+                             "arguments are player files)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('-o', '--output-dir', help='write <name>.json files into the directory')
+    output.add_argument('--mv-data', metavar='DIR', help='write into a Multiverse-Inventories data folder')
+    parser.add_argument('--mv-group', metavar='GROUP', help='also write profiles into groups/GROUP/ of --mv-data')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f'daemon socket path, {DEFAULT_SOCKET} by default')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    player_filenames = args.files or [line.strip() for line in sys.stdin if line.strip()]
+    answered = 0
+    failed = False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(args.socket)
+        sender = threading.Thread(target=send_requests, args=(sock, player_filenames, args), daemon=True)
+        sender.start()
+        with sock.makefile('rb') as in_file:
+            try:
+                for player_filename, line in zip(player_filenames, in_file):
+                    response = json.loads(line)
+                    answered += 1
+                    if not response['ok']:
+                        failed = True
+                        print(f'{player_filename}: {response["error"]}', file=sys.stderr)
+                    elif 'path' in response:
+                        print(response['path'])
+                    else:
+                        print(json.dumps(response['data']))
+            except (OSError, ValueError):
+                pass  # connection reset or a response cut off
+        sender.join()
+    # The daemon closed the connection early (crashed or restarted)
+    for player_filename in player_filenames[answered:]:
+        failed = True
+        print(f'{player_filename}: no response, the daemon closed the connection', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
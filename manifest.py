@@ -0,0 +1,65 @@
+import os
+import json
+
+# Manifest of converted player files:
+# {'manifest': MANIFEST_VERSION, 'files': {source path: entry}}
+# entry: {'size', 'mtime_ns', 'sha256', 'output', 'version'}
+
+MANIFEST_VERSION = 1
+
+
+def make_entry(stat, digest, output, version):
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+        'output': output,
+        'version': version,
+    }
+
+
+def load(path):
+    # Missing or outdated manifest means everything is converted again
+    try:
+        with open(path) as in_file:
+            data = json.load(in_file)
+    except FileNotFoundError:
+        return {}
+    if data.get('manifest') != MANIFEST_VERSION:
+        return {}
+    return data
+
+
+def save(path, data):
+    data = dict(data, manifest=MANIFEST_VERSION)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as out_file:
+        json.dump(data, out_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan(player_filenames, files, version):
+    # Returns the files to be (re)converted and the manifest entries without a source file.
+    # Unchanged files cost a single stat: size and mtime decide, the workers hash the files they convert.
+    changed = []
+    for player_filename in player_filenames:
+        stat = os.stat(player_filename)
+        entry = files.get(player_filename)
+        if (entry is None or entry['version'] != version or entry['size'] != stat.st_size
+                or entry['mtime_ns'] != stat.st_mtime_ns):
+            changed.append(player_filename)
+
+    sources = set(player_filenames)
+    orphaned = {path: entry for path, entry in files.items() if path not in sources}
+    return changed, orphaned
+
+
+def remove_outputs(files, removed, remove):
+    # Removes outputs of removed entries with remove(path), unless another source still converts into the same file.
+    # Returns the files remove() left in place.
+    outputs = {entry['output'] for entry in files.values()}
+    kept = []
+    for entry in removed:
+        if entry['output'] not in outputs:
+            kept.extend(remove(entry['output']))
+    return kept
@@ -0,0 +1,104 @@
+import os
+import sys
+import argparse
+
+import convert
+import mvinv
+
+# Merging the playerdata of several servers into one Multiverse-Inventories data folder:
+#   python ./merge.py --mv-data DIR --source PLAYERDATA=WORLD[:GROUP] [--source ...] [-j WORKERS]
+# Each source directory is listed once into an index of uuid -> player files, then every uuid is converted as one
+# task: the .dat files of all sources are read and every profile of the player (worlds/<world>/, groups/<group>/
+# and players/) is written once, instead of once per source. Sources of the same world or group are joined by game
+# mode, the most recently saved file wins. The player name and last world are those of the newest file.
+# A corrupt file fails its whole player, so no profile is left half merged.
+
+
+def parse_source(value):
+    # 'DIR=WORLD[:GROUP]' -> (directory, world, group or None)
+    directory, _, target = value.rpartition('=')
+    world, _, group = target.partition(':')
+    if not directory or not world:
+        raise argparse.ArgumentTypeError(f"source must be 'PLAYERDATA=WORLD[:GROUP]', got {value!r}")
+    return directory, world, group or None
+
+
+def index_sources(sources):
+    # uuid -> [(player file, world, group)] in sources order, from one listing per source directory
+    index = {}
+    for directory, world, group in sources:
+        for player_filename in convert.find_player_files(directory):
+            uuid = os.path.splitext(os.path.basename(player_filename))[0].lower()
+            index.setdefault(uuid, []).append((player_filename, world, group))
+    return index
+
+
+def merge_player(player_files):
+    # Returns name, {world: json data}, {group: json data} and the last world of one player's files
+    players = []
+    for player_filename, world, group in player_files:
+        saved = os.stat(player_filename).st_mtime_ns
+        name, json_data = convert.read_player(player_filename, world)
+        players.append((saved, name, world, group, json_data))
+    players.sort(key=lambda player: player[0])  # stable: same time keeps sources order, the later source wins
+
+    worlds = {}
+    groups = {}
+    for _, _, world, group, json_data in players:
+        # json data is {game mode: section}, a newer save replaces the section of its game mode
+        worlds.setdefault(world, {}).update(json_data)
+        if group:
+            groups.setdefault(group, {}).update(json_data)
+    _, name, last_world, _, _ = players[-1]
+    return name, worlds, groups, last_world
+
+
+def write_merged(player_files, output):
+    return output.write_player(*merge_player(player_files))
+
+
+def merge_task(player, output):
+    uuid, player_files = player
+    return (uuid, *convert.run_guarded(write_merged, player_files, output), convert.worker_stats())
+
+
+def merge(sources, mv_data, workers=None, max_in_flight=None, worker_options=None):
+    # Returns ({uuid: world profile paths}, [(uuid, error)])
+    index = index_sources(sources)
+    print(f'{len(index)} player(s) in {sum(map(len, index.values()))} file(s) of {len(sources)} source(s)',
+          file=sys.stderr)
+    output = mvinv.DataFolder(mv_data)
+    results = convert.BatchResults()
+    players = ((uuid, tuple(index[uuid])) for uuid in sorted(index))
+    for result in convert.run_tasks(merge_task, players, (output,), workers, max_in_flight,
+                                    worker_options=worker_options):
+        results.add(result)
+    results.finish()
+    return results.converted, results.failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Merge the playerdata directories of several servers into one Multiverse-Inventories data folder')
+    parser.add_argument('--source', type=parse_source, action='append', required=True,
+                        metavar='PLAYERDATA=WORLD[:GROUP]',
+                        help='playerdata directory, Multiverse world (overworld) name of its server and optionally '
+                             'the group to also write into, repeat for every server')
+    parser.add_argument('--mv-data', metavar='DIR', required=True, help='Multiverse-Inventories data folder')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--item-cache', type=int, default=0, metavar='MB',
+                        help='memoize serialized item stacks using up to MB megabytes per worker')
+    parser.add_argument('--usercache', metavar='FILE',
+                        help="server's usercache.json, fills in missing skull owner names and uuids")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    worker_options = {'item_cache_bytes': args.item_cache << 20, 'usercache': args.usercache}
+    _, failures = merge(args.source, args.mv_data, args.workers, worker_options=worker_options)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import os
+import json
+import tempfile
+
+# Multiverse-Inventories data folder layout:
+# https://github.com/Multiverse/Multiverse-Inventories/blob/main/src/main/java/com/onarandombox/multiverseinventories/profile/FlatFilePlayerData.java
+#   players/<name>.json          global profile (last world, last known name)
+#   worlds/<world>/<name>.json   world profile, one section per game mode
+#   groups/<group>/<name>.json   group profile, one section per game mode
+
+PLAYERS_FOLDER = 'players'
+WORLDS_FOLDER = 'worlds'
+GROUPS_FOLDER = 'groups'
+
+
+def read_json(path):
+    try:
+        with open(path) as in_file:
+            return json.load(in_file)
+    except FileNotFoundError:
+        return None
+
+
+def write_json_atomic(path, json_data):
+    # Temp file in the same directory and rename, so an interrupted run never leaves a half-written profile.
+    # The json is encoded up front and written with one call.
+    data = json.dumps(json_data).encode('utf-8')
+    directory, filename = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out_file:
+            out_file.write(data)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates owner-only files
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def merge_profile(existing, json_data):
+    # Sections of other game modes are kept, keys of the same game mode section are updated
+    if not existing:
+        return json_data
+    for game_mode, section in json_data.items():
+        existing_section = existing.get(game_mode)
+        if isinstance(existing_section, dict):
+            existing_section.update(section)
+        else:
+            existing[game_mode] = section
+    return existing
+
+
+class DataFolder:
+    def __init__(self, root, world='world', group=None):
+        self.root = root
+        self.world = world
+        self.group = group
+        self.created = set()  # directories already made by this process
+
+    def __getstate__(self):
+        # Pool workers get their own directory cache
+        return dict(self.__dict__, created=set())
+
+    def ensure_dir(self, directory):
+        if directory not in self.created:
+            os.makedirs(directory, exist_ok=True)
+            self.created.add(directory)
+
+    def profile_path(self, folder, container, name):
+        return os.path.join(self.root, folder, container, name + '.json')
+
+    def global_path(self, name):
+        return os.path.join(self.root, PLAYERS_FOLDER, name + '.json')
+
+    def write_profile(self, path, json_data):
+        self.ensure_dir(os.path.dirname(path))
+        write_json_atomic(path, merge_profile(read_json(path), json_data))
+
+    def write_global(self, name, last_world):
+        path = self.global_path(name)
+        self.ensure_dir(os.path.dirname(path))
+        profile = read_json(path) or {}
+        player_data = profile.setdefault('playerData', {})
+        player_data['lastKnownName'] = name
+        player_data.setdefault('lastWorld', last_world)
+        player_data.setdefault('shouldLoad', True)
+        write_json_atomic(path, profile)
+
+    def write_player(self, name, worlds, groups, last_world):
+        # Profiles of one player in several worlds and groups ({world or group: json data}), each file is written
+        # once. Returns the world profile paths.
+        paths = []
+        for world, json_data in worlds.items():
+            path = self.profile_path(WORLDS_FOLDER, world, name)
+            self.write_profile(path, json_data)
+            paths.append(path)
+        for group, json_data in groups.items():
+            self.write_profile(self.profile_path(GROUPS_FOLDER, group, name), json_data)
+        self.write_global(name, last_world)
+        return paths
+
+    def write(self, json_data, name):
+        # Returns the world profile path
+        groups = {self.group: json_data} if self.group else {}
+        return self.write_player(name, {self.world: json_data}, groups, self.world)[0]
+
+    def remove(self, path):
+        # World profile path returned by write() -> files of that player left in place. The profiles also hold the
+        # sections of other game modes and sources, and the global file is shared by every world, so nothing is
+        # deleted: the world, group and global files are returned for a manual cleanup.
+        name = os.path.splitext(os.path.basename(path))[0]
+        paths = [path]
+        if self.group:
+            paths.append(self.profile_path(GROUPS_FOLDER, self.group, name))
+        paths.append(self.global_path(name))
+        return [path for path in paths if os.path.exists(path)]
@@ -0,0 +1,330 @@
+import io
+import os
+import mmap
+import zlib
+import struct
+
+# https://minecraft.wiki/w/NBT_format#Binary_format
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+NUMERIC_FORMATS = {
+    TAG_BYTE: struct.Struct('>b'),
+    TAG_SHORT: struct.Struct('>h'),
+    TAG_INT: struct.Struct('>i'),
+    TAG_LONG: struct.Struct('>q'),
+    TAG_FLOAT: struct.Struct('>f'),
+    TAG_DOUBLE: struct.Struct('>d'),
+}
+ARRAY_ITEM_FORMATS = {
+    TAG_BYTE_ARRAY: 'b',
+    TAG_INT_ARRAY: 'i',
+    TAG_LONG_ARRAY: 'q',
+}
+ARRAY_ITEM_TYPES = {
+    TAG_BYTE_ARRAY: TAG_BYTE,
+    TAG_INT_ARRAY: TAG_INT,
+    TAG_LONG_ARRAY: TAG_LONG,
+}
+
+_length = struct.Struct('>i')
+_name_length = struct.Struct('>H')
+
+
+class MalformedFileError(Exception):
+    pass
+
+
+# Parsed nodes mimic the parts of the nbt library interface used by the serializers:
+# scalars have .value/.valuestr(), compounds are dicts of child nodes, lists and arrays are lists.
+# Every node remembers the span of its payload in the decompressed buffer, so it can be written back without
+# re-encoding.
+
+class Node:
+    __slots__ = ()
+
+    def raw(self):
+        return self.data[self.start:self.end]
+
+    def _render_buffer(self, buffer):
+        # Makes nodes renderable by nbt.nbt.TAG_Compound._render_buffer
+        buffer.write(self.raw())
+
+
+class Tag(Node):
+    __slots__ = ('id', 'name', 'value', 'data', 'start', 'end')
+
+    def __init__(self, tag_id, name, value, data, start, end):
+        self.id = tag_id
+        self.name = name
+        self.value = value
+        self.data = data
+        self.start = start
+        self.end = end
+
+    def valuestr(self):
+        return str(self.value)
+
+    def __repr__(self):
+        return f'Tag({self.id}, {self.name!r}, {self.value!r})'
+
+
+class RawTag(Tag):
+    # Undecoded tag, only its payload span is kept
+    __slots__ = ()
+
+    def valuestr(self):
+        return f'[{self.end - self.start} raw byte(s)]'
+
+
+class Compound(Node, dict):
+    __slots__ = ('id', 'name', 'data', 'start', 'end')
+
+
+class List(Node, list):
+    # TAG_List or one of the array tags, tag_id is the type of the items
+    __slots__ = ('id', 'name', 'tag_id', 'data', 'start', 'end')
+
+
+def decode_string(raw):
+    try:
+        return str(raw, 'utf-8')
+    except UnicodeDecodeError:
+        return decode_mutf8(bytes(raw))
+
+
+def decode_mutf8(raw):
+    # Java writes strings in modified UTF-8: NUL as 0xC0 0x80 and supplementary characters as surrogate pairs
+    text = raw.replace(b'\xc0\x80', b'\x00').decode('utf-8', 'surrogatepass')
+    return text.encode('utf-16', 'surrogatepass').decode('utf-16')
+
+
+def read_name(data, pos):
+    length = _name_length.unpack_from(data, pos)[0]
+    return decode_string(data[pos + 2:pos + 2 + length]), pos + 2 + length
+
+
+def skip_payload(data, pos, tag_id):
+    # Returns position right after the payload of tag_id starting at pos, without decoding it
+    fmt = NUMERIC_FORMATS.get(tag_id)
+    if fmt is not None:
+        return pos + fmt.size
+    if tag_id == TAG_STRING:
+        return pos + 2 + _name_length.unpack_from(data, pos)[0]
+    item_type = ARRAY_ITEM_TYPES.get(tag_id)
+    if item_type is not None:
+        return pos + 4 + _length.unpack_from(data, pos)[0] * NUMERIC_FORMATS[item_type].size
+    if tag_id == TAG_LIST:
+        item_id = data[pos]
+        count = _length.unpack_from(data, pos + 1)[0]
+        pos += 5
+        fmt = NUMERIC_FORMATS.get(item_id)
+        if fmt is not None:
+            return pos + count * fmt.size
+        for _ in range(count):
+            pos = skip_payload(data, pos, item_id)
+        return pos
+    if tag_id == TAG_COMPOUND:
+        while True:
+            item_id = data[pos]
+            if item_id == TAG_END:
+                return pos + 1
+            pos += 3 + _name_length.unpack_from(data, pos + 1)[0]
+            pos = skip_payload(data, pos, item_id)
+    raise MalformedFileError(f'Unrecognised tag type {tag_id}')
+
+
+def parse_payload(data, pos, tag_id, name=None):
+    # Returns the node of tag_id payload starting at pos and the position right after it
+    fmt = NUMERIC_FORMATS.get(tag_id)
+    if fmt is not None:
+        end = pos + fmt.size
+        return Tag(tag_id, name, fmt.unpack_from(data, pos)[0], data, pos, end), end
+
+    if tag_id == TAG_STRING:
+        end = pos + 2 + _name_length.unpack_from(data, pos)[0]
+        return Tag(tag_id, name, decode_string(data[pos + 2:end]), data, pos, end), end
+
+    if tag_id == TAG_COMPOUND:
+        node = Compound()
+        start = pos
+        while True:
+            item_id = data[pos]
+            if item_id == TAG_END:
+                pos += 1
+                break
+            item_name, pos = read_name(data, pos + 1)
+            node[item_name], pos = parse_payload(data, pos, item_id, item_name)
+
+    elif tag_id == TAG_LIST:
+        node = List()
+        start = pos
+        item_id = data[pos]
+        count = _length.unpack_from(data, pos + 1)[0]
+        pos += 5
+        fmt = NUMERIC_FORMATS.get(item_id)
+        if fmt is not None:
+            size = fmt.size
+            values = struct.unpack_from(f'>{count}{fmt.format[-1]}', data, pos)
+            node.extend(Tag(item_id, None, value, data, pos + i * size, pos + i * size + size)
+                        for i, value in enumerate(values))
+            pos += count * size
+        else:
+            for _ in range(count):
+                item, pos = parse_payload(data, pos, item_id)
+                node.append(item)
+        node.tag_id = item_id
+
+    elif tag_id in ARRAY_ITEM_FORMATS:
+        count = _length.unpack_from(data, pos)[0]
+        node = List(struct.unpack_from(f'>{count}{ARRAY_ITEM_FORMATS[tag_id]}', data, pos + 4))
+        node.tag_id = ARRAY_ITEM_TYPES[tag_id]
+        start = pos
+        pos += 4 + count * NUMERIC_FORMATS[node.tag_id].size
+
+    else:
+        raise MalformedFileError(f'Unrecognised tag type {tag_id}')
+
+    node.id = tag_id
+    node.name = name
+    node.data = data
+    node.start = start
+    node.end = pos
+    return node, pos
+
+
+def parse(data, tags=None, raw_tags=()):
+    # Decodes only the root compound tags named in tags (all if None).
+    # Tags named in raw_tags are kept as RawTag byte slices, everything else is skipped by its length.
+    data = memoryview(data)
+    try:
+        if data[0] != TAG_COMPOUND:
+            raise MalformedFileError('First record is not a Compound Tag')
+        root_name, pos = read_name(data, 1)
+        root = Compound()
+        start = pos
+        while True:
+            tag_id = data[pos]
+            if tag_id == TAG_END:
+                pos += 1
+                break
+            name, pos = read_name(data, pos + 1)
+            if tags is None or name in tags:
+                root[name], pos = parse_payload(data, pos, tag_id, name)
+            else:
+                end = skip_payload(data, pos, tag_id)
+                if name in raw_tags:
+                    root[name] = RawTag(tag_id, name, None, data, pos, end)
+                pos = end
+    except (IndexError, struct.error) as e:
+        raise MalformedFileError('Partial File Parse: file possibly truncated.') from e
+    root.id = TAG_COMPOUND
+    root.name = root_name
+    root.data = data
+    root.start = start
+    root.end = pos
+    return root
+
+
+def encode_named(tag):
+    # Type id, name and payload of a compound entry. Parsed nodes are copied from the source buffer,
+    # other tags with the nbt library interface are rendered.
+    name = tag.name.encode('utf-8')
+    if isinstance(tag, Node):
+        payload = tag.raw()
+    else:
+        with io.BytesIO() as buffer:
+            tag._render_buffer(buffer)
+            payload = buffer.getvalue()
+    return b''.join((bytes((tag.id,)), _name_length.pack(len(name)), name, payload))
+
+
+def encode_compound(tags, name=''):
+    # Uncompressed NBT file with a root compound of the given tags
+    name = name.encode('utf-8')
+    parts = [bytes((TAG_COMPOUND,)), _name_length.pack(len(name)), name]
+    parts.extend(encode_named(tag) for tag in tags)
+    parts.append(bytes((TAG_END,)))
+    return b''.join(parts)
+
+
+# Same header GzipFile writes for a nameless file object at compresslevel 9, with zero mtime
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff'
+_gzip_trailer = struct.Struct('<II')
+
+
+def gzip_compress(data):
+    # One-shot deflate: the zlib stream minus its 2 byte header and adler32 trailer is the raw deflate data
+    deflated = zlib.compress(data, 9)[2:-4]
+    return b''.join((GZIP_HEADER, deflated, _gzip_trailer.pack(zlib.crc32(data), len(data) & 0xffffffff)))
+
+
+# Files this large are memory-mapped, smaller ones (every sane player.dat) are read with a single read() call
+MMAP_THRESHOLD = 1 << 20
+# Max ratio of deflate, caps the output size taken from the gzip trailer of a corrupt or hostile file
+MAX_DEFLATE_RATIO = 1032
+
+
+def read_file(filename):
+    # Whole file as bytes, or as a read-only mmap from MMAP_THRESHOLD. open/fstat/read/close, without the buffered
+    # file object's extra lseek, fstat and end of file read calls.
+    fd = os.open(filename, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        size = os.fstat(fd).st_size
+        if size >= MMAP_THRESHOLD:
+            return mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+
+def gunzip(data):
+    # Single zlib call with the output buffer allocated once, sized from the ISIZE field of the gzip trailer.
+    # zlib checks the trailer CRC and size, so a file caught while being rewritten fails instead of parsing garbage.
+    if data[:2] != GZIP_HEADER[:2]:
+        raise MalformedFileError(f'Not a gzipped file ({bytes(data[:2])!r})')
+    size = min(int.from_bytes(data[-4:], 'little'), len(data) * MAX_DEFLATE_RATIO)
+    try:
+        result = zlib.decompress(data, 16 + zlib.MAX_WBITS, max(size, 1))
+    except zlib.error as e:
+        raise MalformedFileError(f'Corrupt gzip data: {e}') from e
+    if len(result) != size:
+        # Several gzip members (e.g. concatenated files), ISIZE was the last member's
+        import gzip
+        result = gzip.decompress(data)
+    return result
+
+
+def read_nbt(filename, digest=None):
+    # Uncompressed NBT of a gzipped file, digest (a hashlib object) is updated with the gzipped bytes
+    content = read_file(filename)
+    try:
+        if digest is not None:
+            digest.update(content)
+        return gunzip(content)
+    finally:
+        if isinstance(content, mmap.mmap):
+            content.close()
+
+
+def load(filename, tags=None, raw_tags=(), digest=None):
+    return parse(read_nbt(filename, digest), tags, raw_tags)
+
+
+def loads(data, tags=None, raw_tags=()):
+    # Gzipped or uncompressed NBT bytes
+    if data[:2] == GZIP_HEADER[:2]:
+        data = gunzip(data)
+    return parse(data, tags, raw_tags)
@@ -0,0 +1,121 @@
+import json
+import uuid
+import functools
+
+import nbtreader
+from nbtreader import TAG_STRING, TAG_COMPOUND, TAG_INT_ARRAY
+
+# SkullOwner -> CraftPlayerProfile.serialize()
+# https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/profile/CraftPlayerProfile.java#239
+# https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/profile/CraftProfileProperty.java
+# Missing name or uuid is looked up in the server's usercache.json, when one was loaded with set_usercache()
+
+CACHE_SIZE = 1024
+
+usercache = {}  # lower case name and uuid string -> (uuid, name)
+
+
+def load_usercache(path):
+    # usercache.json: [{"name": ..., "uuid": ..., "expiresOn": ...}, ...]
+    with open(path, encoding='utf-8') as in_file:
+        entries = json.load(in_file)
+    index = {}
+    for entry in entries:
+        name = entry.get('name')
+        unique_id = entry.get('uuid')
+        if not name or not unique_id:
+            continue
+        unique_id = str(uuid.UUID(unique_id))
+        index[name.lower()] = (unique_id, name)
+        index[unique_id] = (unique_id, name)
+    return index
+
+
+def set_usercache(index):
+    global usercache
+    usercache = index or {}
+    profile_fields.cache_clear()
+
+
+def int_array_uuid(values):
+    # net.minecraft.core.UUIDUtil.uuidFromIntArray
+    value = 0
+    for part in values:
+        value = (value << 32) | (part & 0xffffffff)
+    return str(uuid.UUID(int=value))
+
+
+def read_uuid(tag):
+    if tag.id == TAG_INT_ARRAY and len(tag) == 4:
+        return int_array_uuid(tag)
+    if tag.id == TAG_STRING:
+        # Pre 1.16 string ids
+        try:
+            return str(uuid.UUID(tag.value))
+        except ValueError:
+            return None
+    return None
+
+
+def read_properties(properties_tag):
+    # GameProfileSerializer.readGameProfile: Properties: {textures: [{Value: ..., Signature: ...}]}
+    properties = []
+    for name, values in properties_tag.items():
+        if values.id != nbtreader.TAG_LIST:
+            continue
+        for value in values:
+            if value.id != TAG_COMPOUND or 'Value' not in value:
+                continue
+            signature = value['Signature'].value if 'Signature' in value else None
+            properties.append((name, value['Value'].value, signature))
+    return tuple(properties)
+
+
+def read_profile(owner_tag):
+    # Returns (uuid, name, properties) or None, like GameProfileSerializer.readGameProfile
+    if owner_tag.id == TAG_STRING:
+        unique_id, name, properties = None, owner_tag.value or None, ()
+    elif owner_tag.id == TAG_COMPOUND:
+        name = (owner_tag['Name'].value or None) if 'Name' in owner_tag else None
+        unique_id = read_uuid(owner_tag['Id']) if 'Id' in owner_tag else None
+        properties = read_properties(owner_tag['Properties']) if 'Properties' in owner_tag else ()
+    else:
+        return None
+
+    if unique_id is None and name is not None:
+        unique_id = usercache.get(name.lower(), (None, None))[0]
+    elif name is None and unique_id is not None:
+        name = usercache.get(unique_id, (None, None))[1]
+    if unique_id is None and name is None:
+        return None
+    return unique_id, name, properties
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def profile_fields(tag_id, payload):
+    # Keyed by the SkullOwner bytes: decorative heads repeat the same texture blob on every item
+    node, _ = nbtreader.parse_payload(memoryview(payload), 0, tag_id)
+    return read_profile(node)
+
+
+def serialize_profile(owner_tag):
+    if isinstance(owner_tag, nbtreader.Node):
+        fields = profile_fields(owner_tag.id, bytes(owner_tag.raw()))
+    else:
+        fields = read_profile(owner_tag)
+    if fields is None:
+        return None
+    unique_id, name, properties = fields
+    profile = {'==': 'PlayerProfile'}
+    if unique_id is not None:
+        profile['uniqueId'] = unique_id
+    if name is not None:
+        profile['name'] = name
+    if properties:
+        profile['properties'] = []
+        for property_name, value, signature in properties:
+            prop = {'name': property_name, 'value': value}
+            if signature is not None:
+                prop['signature'] = signature
+            profile['properties'].append(prop)
+    return profile
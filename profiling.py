@@ -0,0 +1,107 @@
+import time
+import heapq
+import functools
+
+# Opt-in counters for --stats. Nothing here runs unless convert.enable_profiling() has wrapped the functions.
+# Stage times are inclusive: a bundle serializer time contains the time of its nested items.
+
+SLOWEST_FILES = 10
+
+
+class Profile:
+    def __init__(self):
+        self.stages = {}  # stage name -> [calls, seconds]
+        self.files = 0
+        self.items = 0
+        self.max_items = (0, None)  # item count, file
+        self.slowest = []  # heap of (seconds, file, item count)
+
+    def timed(self, name, fn):
+        counter = self.stages.setdefault(name, [0, 0.0])
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                counter[0] += 1
+                counter[1] += time.perf_counter() - start
+        return wrapper
+
+    def counted(self, fn, count):
+        # Counts serialized item stacks, count(result) is the number of stacks in a result including nested ones
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            self.items += count(result)
+            return result
+        return wrapper
+
+    def per_file(self, fn):
+        # fn takes the player filename as first argument
+        timed_fn = self.timed('file', fn)
+
+        @functools.wraps(fn)
+        def wrapper(player_filename, *args, **kwargs):
+            items = self.items
+            start = time.perf_counter()
+            try:
+                return timed_fn(player_filename, *args, **kwargs)
+            finally:
+                self.add_file(player_filename, time.perf_counter() - start, self.items - items)
+        return wrapper
+
+    def add_file(self, player_filename, seconds, items):
+        self.files += 1
+        if items > self.max_items[0]:
+            self.max_items = (items, player_filename)
+        entry = (seconds, player_filename, items)
+        if len(self.slowest) < SLOWEST_FILES:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def to_dict(self):
+        return {
+            'stages': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.stages.items()},
+            'files': self.files,
+            'items': self.items,
+            'max_items': {'items': self.max_items[0], 'file': self.max_items[1]},
+            'slowest': [{'file': name, 'seconds': seconds, 'items': items}
+                        for seconds, name, items in sorted(self.slowest, reverse=True)],
+        }
+
+
+def merge(profiles):
+    # Combines to_dict() snapshots of several workers
+    result = {'stages': {}, 'files': 0, 'items': 0, 'max_items': {'items': 0, 'file': None}, 'slowest': []}
+    for profile in profiles:
+        for name, stage in profile['stages'].items():
+            total = result['stages'].setdefault(name, {'calls': 0, 'seconds': 0.0})
+            total['calls'] += stage['calls']
+            total['seconds'] += stage['seconds']
+        result['files'] += profile['files']
+        result['items'] += profile['items']
+        if profile['max_items']['items'] > result['max_items']['items']:
+            result['max_items'] = profile['max_items']
+        result['slowest'].extend(profile['slowest'])
+    result['slowest'] = sorted(result['slowest'], key=lambda entry: entry['seconds'], reverse=True)[:SLOWEST_FILES]
+    return result
+
+
+def format_report(profile):
+    lines = [f'{"stage":<36}{"calls":>10}{"total s":>12}{"avg ms":>10}']
+    for name, stage in sorted(profile['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True):
+        if stage['calls']:
+            lines.append(f'{name:<36}{stage["calls"]:>10}{stage["seconds"]:>12.3f}'
+                         f'{stage["seconds"] / stage["calls"] * 1000:>10.3f}')
+    files = profile['files']
+    lines.append(f'{files} file(s), {profile["items"]} item stack(s), '
+                 f'{profile["items"] / files if files else 0:.1f} per file, '
+                 f'max {profile["max_items"]["items"]} in {profile["max_items"]["file"]}')
+    if profile['slowest']:
+        lines.append('slowest files:')
+        lines.extend(f'  {entry["seconds"] * 1000:>9.2f} ms {entry["items"]:>6} items  {entry["file"]}'
+                     for entry in profile['slowest'])
+    return '\n'.join(lines)
@@ -0,0 +1,194 @@
+import sys
+import json
+import argparse
+from collections import Counter
+
+import convert
+import nbtreader
+import tables
+from nbtreader import (TAG_END, TAG_INT, TAG_STRING, TAG_LIST, TAG_COMPOUND, MalformedFileError, read_name,
+                       skip_payload)
+
+# Read-only survey of playerdata before a migration:
+#   python ./scan.py <playerdata dir|glob> [-j WORKERS] [--top N] [--json FILE]
+# Items are walked straight over the decompressed bytes, only item ids and tag names are decoded. Meta serializers are
+# picked with the tables of the file's DataVersion, as the conversion does.
+
+# Tags kept in HANDLED_TAGS but not serialized yet (see TODOs in convert.py)
+TODO_TAGS = ('PublicBukkitValues',)
+# Item lists nested in the item 'tag' compound and in its BlockEntityTag
+NESTED_ITEMS_TAGS = ('Items', 'ChargedProjectiles')
+INVENTORY_TAGS = ('Inventory', 'EnderItems')
+REPORT_KEYS = ('item_types', 'meta_serializers', 'unhandled_tags', 'todo_tags', 'nesting_depth')
+
+
+def new_report():
+    report = {key: Counter() for key in REPORT_KEYS}
+    report['files'] = 0
+    report['items'] = 0
+    return report
+
+
+def scan_items(data, pos, depth, report):
+    # pos is at a TAG_List payload, returns position after it
+    item_id = data[pos]
+    if item_id != TAG_COMPOUND:
+        return skip_payload(data, pos, TAG_LIST)
+    count = int.from_bytes(data[pos + 1:pos + 5], 'big', signed=True)
+    pos += 5
+    for _ in range(count):
+        pos = scan_item(data, pos, depth, report)
+    return pos
+
+
+def scan_item(data, pos, depth, report):
+    # pos is at an item stack compound payload, returns position after it
+    item_type = None
+    tag_pos = None
+    while True:
+        tag_id = data[pos]
+        if tag_id == TAG_END:
+            pos += 1
+            break
+        name, pos = read_name(data, pos + 1)
+        if name == 'id' and tag_id == TAG_STRING:
+            item_type, _ = read_name(data, pos)
+        elif name == 'tag' and tag_id == TAG_COMPOUND:
+            tag_pos = pos
+        pos = skip_payload(data, pos, tag_id)
+
+    item_type = (item_type or 'minecraft:air').split(':')[-1].upper()
+    report['items'] += 1
+    report['item_types'][item_type] += 1
+    report['nesting_depth'][depth] += 1
+    if tag_pos is not None:
+        report['meta_serializers'][convert.serialize_meta_fn(item_type).__name__] += 1
+        scan_meta(data, tag_pos, depth, report)
+    return pos
+
+
+def scan_meta(data, pos, depth, report):
+    while True:
+        tag_id = data[pos]
+        if tag_id == TAG_END:
+            return
+        name, pos = read_name(data, pos + 1)
+        if name not in convert.HANDLED_TAGS:
+            report['unhandled_tags'][name] += 1
+        elif name in TODO_TAGS:
+            report['todo_tags'][name] += 1
+        if name in NESTED_ITEMS_TAGS and tag_id == TAG_LIST:
+            pos = scan_items(data, pos, depth + 1, report)
+        elif name == 'BlockEntityTag' and tag_id == TAG_COMPOUND:
+            pos = scan_block_entity(data, pos, depth, report)
+        else:
+            pos = skip_payload(data, pos, tag_id)
+
+
+def scan_block_entity(data, pos, depth, report):
+    # Container contents (shulker boxes, chests) are counted as nested items
+    while True:
+        tag_id = data[pos]
+        if tag_id == TAG_END:
+            return pos + 1
+        name, pos = read_name(data, pos + 1)
+        if name == 'Items' and tag_id == TAG_LIST:
+            pos = scan_items(data, pos, depth + 1, report)
+        else:
+            pos = skip_payload(data, pos, tag_id)
+
+
+def scan_player(data, report):
+    data = memoryview(data)
+    if data[0] != TAG_COMPOUND:
+        raise MalformedFileError('First record is not a Compound Tag')
+    _, pos = read_name(data, 1)
+    # DataVersion may come after the inventories, they are walked once the root compound was skipped through
+    data_version = None
+    inventories = []
+    while True:
+        tag_id = data[pos]
+        if tag_id == TAG_END:
+            break
+        name, pos = read_name(data, pos + 1)
+        if name in INVENTORY_TAGS and tag_id == TAG_LIST:
+            inventories.append(pos)
+        elif name == 'DataVersion' and tag_id == TAG_INT:
+            data_version = int.from_bytes(data[pos:pos + 4], 'big', signed=True)
+        pos = skip_payload(data, pos, tag_id)
+    with tables.using(data_version):
+        for pos in inventories:
+            scan_items(data, pos, 0, report)
+    report['files'] += 1
+
+
+def scan_file(player_filename):
+    report = new_report()
+    scan_player(nbtreader.read_nbt(player_filename), report)
+    return report
+
+
+def scan_task(player_filename):
+    return (player_filename, *convert.run_guarded(scan_file, player_filename), None)
+
+
+def merge_report(total, report):
+    for key in REPORT_KEYS:
+        total[key].update(report[key])
+    total['files'] += report['files']
+    total['items'] += report['items']
+
+
+def scan(player_filenames, workers=None):
+    total = new_report()
+    failures = []
+    for player_filename, report, error, _ in convert.run_tasks(scan_task, player_filenames, workers=workers):
+        if error is None:
+            merge_report(total, report)
+        else:
+            failures.append((player_filename, error))
+    return total, failures
+
+
+def format_report(report, top=20):
+    lines = [f'{report["files"]} file(s), {report["items"]} item stack(s)']
+    titles = {
+        'item_types': 'item types',
+        'meta_serializers': 'meta serializers',
+        'unhandled_tags': "unhandled tags (stored in 'internal')",
+        'todo_tags': 'not implemented tags (dropped)',
+        'nesting_depth': 'items by nesting depth',
+    }
+    for key, title in titles.items():
+        counter = report[key]
+        lines.append(f'\n{title}: {len(counter)} distinct')
+        entries = sorted(counter.items()) if key == 'nesting_depth' else counter.most_common(top)
+        lines.extend(f'  {count:>10}  {name}' for name, count in entries)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Histogram item types and unhandled tags without converting')
+    parser.add_argument('source', help='playerdata directory, glob pattern or a single player.dat file')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--top', type=int, default=20, help='rows per histogram')
+    parser.add_argument('--json', metavar='FILE', help="write the full report as json into FILE ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    report, failures = scan(convert.find_player_files(args.source), args.workers)
+    if args.json:
+        data = json.dumps(report, indent=1)
+        if args.json == '-':
+            print(data)
+        else:
+            with open(args.json, 'w') as out_file:
+                out_file.write(data)
+    else:
+        print(format_report(report, args.top))
+    for player_filename, error in failures:
+        print(f'  {player_filename}: {error}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,558 @@
+import io
+import os
+import sys
+import gzip
+import json
+import zlib
+import base64
+import socket
+import struct
+import hashlib
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import convert
+import nbtreader
+import snbt
+import chatmessage
+import manifest
+import shards
+import merge
+import watch
+import daemon
+import daemon_client
+import columns
+import mvinv
+from nbtreader import (TAG_END, TAG_BYTE, TAG_SHORT, TAG_INT, TAG_LONG, TAG_FLOAT, TAG_DOUBLE, TAG_BYTE_ARRAY,
+                       TAG_STRING, TAG_LIST, TAG_COMPOUND, TAG_INT_ARRAY, TAG_LONG_ARRAY)
+
+# Regression checks against known outputs of Minecraft, CraftBukkit and the nbt library, and behavior checks of the
+# batch tools on generated player files in a temporary directory:
+#   python ./selfcheck.py
+# Prints every mismatch and exits with 1 if there was one. The nbt library comparisons and the .npz export checks are
+# skipped without the nbt library and numpy.
+
+failures = []
+
+
+def check(name, actual, expected):
+    if actual != expected:
+        failures.append(name)
+        print(f'FAIL {name}\n  expected: {expected!r}\n  actual:   {actual!r}')
+
+
+def check_raises(name, exception, fn, *args):
+    try:
+        result = fn(*args)
+    except exception:
+        return
+    except Exception as e:
+        failures.append(name)
+        print(f'FAIL {name}: raised {type(e).__name__}: {e} instead of {exception.__name__}')
+        return
+    failures.append(name)
+    print(f'FAIL {name}: returned {result!r} instead of raising {exception.__name__}')
+
+
+# https://minecraft.wiki/w/NBT_format#Example: test.nbt of the original specification
+HELLO_WORLD = bytes.fromhex('0a000b68656c6c6f20776f726c640800046e616d65000942616e616e72616d6100')
+
+
+def check_nbtreader():
+    root = nbtreader.parse(HELLO_WORLD)
+    check('nbtreader: hello world root name', root.name, 'hello world')
+    check('nbtreader: hello world string', root['name'].value, 'Bananrama')
+    check('nbtreader: hello world raw', bytes(root.raw()), HELLO_WORLD[14:])
+    check('nbtreader: hello world encode', nbtreader.encode_compound(root.values(), root.name), HELLO_WORLD)
+    check('nbtreader: partial parse', list(nbtreader.parse(HELLO_WORLD, ()).keys()), [])
+    check_raises('nbtreader: truncated file', nbtreader.MalformedFileError, nbtreader.parse, HELLO_WORLD[:-3])
+    check_raises('nbtreader: not a compound', nbtreader.MalformedFileError, nbtreader.parse, HELLO_WORLD[1:])
+
+    # Java's modified UTF-8: NUL as C0 80, U+1F600 as the surrogate pair D83D DE00
+    check('nbtreader: mutf8 nul', nbtreader.decode_string(memoryview(b'a\xc0\x80b')), 'a\x00b')
+    check('nbtreader: mutf8 surrogates', nbtreader.decode_string(memoryview(b'\xed\xa0\xbd\xed\xb8\x80')), '\U0001f600')
+
+    compressed = nbtreader.gzip_compress(HELLO_WORLD)
+    check('nbtreader: gzip_compress', gzip.decompress(compressed), HELLO_WORLD)
+    with io.BytesIO() as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gzip_file:
+            gzip_file.write(HELLO_WORLD)
+        check('nbtreader: gzip_compress GzipFile bytes', compressed, buffer.getvalue())
+    check('nbtreader: gunzip', nbtreader.gunzip(gzip.compress(HELLO_WORLD)), HELLO_WORLD)
+    empty = nbtreader.gzip_compress(b'\n\x00\x00\x00')
+    check('nbtreader: gunzip members', nbtreader.gunzip(compressed + empty), HELLO_WORLD + b'\n\x00\x00\x00')
+    check('nbtreader: loads gzipped', nbtreader.loads(compressed)['name'].value, 'Bananrama')
+    check_raises('nbtreader: gunzip corrupt', nbtreader.MalformedFileError, nbtreader.gunzip,
+                 compressed[:-8] + b'\0' * 8)
+    check_raises('nbtreader: gunzip not gzip', nbtreader.MalformedFileError, nbtreader.gunzip, HELLO_WORLD)
+
+    try:
+        from nbt import nbt
+    except ImportError:
+        print('nbt library not installed, skipped the nbtreader comparisons with it')
+        return
+    # Every tag type, rendered by the nbt library which the converter used before nbtreader
+    tag_file = nbt.NBTFile()
+    tag_file.name = 'root'
+    tag_file.tags.extend((
+        nbt.TAG_Byte(name='byte', value=-128),
+        nbt.TAG_Short(name='short', value=32767),
+        nbt.TAG_Int(name='int', value=-2147483648),
+        nbt.TAG_Long(name='long', value=9223372036854775807),
+        nbt.TAG_Float(name='float', value=0.1),
+        nbt.TAG_Double(name='double', value=-1.5e300),
+        nbt.TAG_String(name='string', value='§aGrün \U0001f600'),
+    ))
+    byte_array = nbt.TAG_Byte_Array(name='byte_array')
+    byte_array.value = bytearray(b'\x00\x7f\x80\xff')
+    int_array = nbt.TAG_Int_Array(name='int_array')
+    int_array.value = [0, -1, 2147483647]
+    long_array = nbt.TAG_Long_Array(name='long_array')
+    long_array.value = [-9223372036854775808, 1]
+    ints = nbt.TAG_List(type=nbt.TAG_Int, name='ints')
+    ints.extend(nbt.TAG_Int(value=value) for value in (3, 2, 1))
+    compounds = nbt.TAG_List(type=nbt.TAG_Compound, name='compounds')
+    for slot in range(2):
+        item = nbt.TAG_Compound()
+        item.tags.extend((nbt.TAG_Byte(name='Slot', value=slot), nbt.TAG_String(name='id', value='minecraft:stone')))
+        compounds.append(item)
+    nested = nbt.TAG_Compound(name='nested')
+    nested.tags.append(nbt.TAG_List(type=nbt.TAG_String, name='empty'))
+    tag_file.tags.extend((byte_array, int_array, long_array, ints, compounds, nested))
+
+    with io.BytesIO() as buffer:
+        tag_file.write_file(buffer=buffer)
+        raw = buffer.getvalue()
+    root = nbtreader.loads(gzip.compress(raw))
+    # Values and valuestr() (the stats of the json) as the nbt library reads them back
+    library_root = nbt.NBTFile(buffer=io.BytesIO(raw))
+    check('nbt library: names', list(root), [tag.name for tag in library_root.tags])
+    for tag in library_root.tags:
+        if tag.id in nbtreader.NUMERIC_FORMATS or tag.id == nbtreader.TAG_STRING:
+            check(f'nbt library: {tag.name} value', root[tag.name].value, tag.value)
+            check(f'nbt library: {tag.name} valuestr', root[tag.name].valuestr(), tag.valuestr())
+    check('nbt library: byte_array', list(root['byte_array']), [-128 + (b + 128) % 256 for b in byte_array.value])
+    check('nbt library: int_array', list(root['int_array']), int_array.value)
+    check('nbt library: long_array', list(root['long_array']), long_array.value)
+    check('nbt library: ints', [tag.value for tag in root['ints']], [3, 2, 1])
+    check('nbt library: compounds', [(tag['Slot'].value, tag['id'].value) for tag in root['compounds']],
+          [(0, 'minecraft:stone'), (1, 'minecraft:stone')])
+    check('nbt library: root encode', nbtreader.encode_compound(root.values(), 'root'), raw)
+
+    # convert.encode_internal input: a mix of parsed nodes and tags built with the nbt library
+    internal = [root['compounds'], nbt.TAG_String(name='extra', value='x'), root['nested']]
+    reference = nbt.NBTFile()
+    reference.tags.extend((compounds, internal[1], nested))
+    with io.BytesIO() as buffer:
+        reference.write_file(buffer=buffer)
+        expected = buffer.getvalue()
+    encoded = convert.encode_internal(internal)
+    check('nbt library: encode_internal', zlib.decompress(base64.b64decode(encoded), 16 + zlib.MAX_WBITS), expected)
+
+
+def named(tag_id, name, payload):
+    name = name.encode('utf-8')
+    return bytes((tag_id,)) + struct.pack('>H', len(name)) + name + payload
+
+
+def string(text):
+    text = text.encode('utf-8')
+    return struct.pack('>H', len(text)) + text
+
+
+def compound(*entries):
+    return b''.join(entries) + b'\0'
+
+
+def to_snbt(payload, tag_id=TAG_COMPOUND):
+    return snbt.to_snbt(nbtreader.parse_payload(memoryview(payload), 0, tag_id)[0])
+
+
+def float32(value):
+    return struct.unpack('>f', struct.pack('>f', value))[0]
+
+
+# java.lang.Float.toString / Double.toString
+JAVA_FLOATS = (
+    (1.0, '1.0'), (0.1, '0.1'), (0.3, '0.3'), (100.0, '100.0'), (1234567.0, '1234567.0'), (1e7, '1.0E7'),
+    (12345678.0, '1.2345678E7'), (0.001, '0.001'), (1e-4, '1.0E-4'), (-2.5, '-2.5'), (-0.0, '-0.0'),
+    (3.4028234663852886e38, '3.4028235E38'), (1.401298464324817e-45, '1.4E-45'),
+    (float('nan'), 'NaN'), (float('inf'), 'Infinity'), (float('-inf'), '-Infinity'),
+)
+JAVA_DOUBLES = (
+    (1.0, '1.0'), (0.1, '0.1'), (123.456, '123.456'), (9999999.0, '9999999.0'), (1e7, '1.0E7'),
+    (12345678.9, '1.23456789E7'), (1e21, '1.0E21'), (0.001, '0.001'), (1e-5, '1.0E-5'), (-0.0, '-0.0'),
+    (1.7976931348623157e308, '1.7976931348623157E308'), (5e-324, '4.9E-324'),
+)
+# net.minecraft.nbt.StringTag.quoteAndEscape
+QUOTED = (
+    ('north', '"north"'), ('it\'s', '"it\'s"'), ('say "hi"', '\'say "hi"\''), ('"It\'s"', '\'"It\\\'s"\''),
+    ('a\\b', '"a\\\\b"'), ('', '""'),
+)
+
+
+def check_snbt():
+    for value, expected in JAVA_FLOATS:
+        check(f'snbt: Float.toString({value!r})', snbt.java_float_string(float32(value), single=True), expected)
+    for value, expected in JAVA_DOUBLES:
+        check(f'snbt: Double.toString({value!r})', snbt.java_float_string(value), expected)
+    for text, expected in QUOTED:
+        check(f'snbt: quoteAndEscape({text!r})', snbt.quote_and_escape(text), expected)
+
+    # BlockStateTag of a stair as CraftMetaItem stores it
+    block_state = compound(named(TAG_STRING, 'half', string('top')), named(TAG_STRING, 'facing', string('north')),
+                           named(TAG_STRING, 'waterlogged', string('false')))
+    check('snbt: block state', to_snbt(block_state),
+          '{\n    facing: "north",\n    half: "top",\n    waterlogged: "false"\n}')
+    numbers = compound(
+        named(TAG_SHORT, 's', struct.pack('>h', 2)), named(TAG_BYTE, 'b', struct.pack('>b', 1)),
+        named(TAG_INT, 'i', struct.pack('>i', 3)), named(TAG_LONG, 'l', struct.pack('>q', 4)),
+        named(TAG_FLOAT, 'f', struct.pack('>f', 0.1)), named(TAG_DOUBLE, 'd', struct.pack('>d', 0.1)))
+    check('snbt: numbers', to_snbt(numbers),
+          '{\n    b: 1b,\n    d: 0.1d,\n    f: 0.1f,\n    i: 3,\n    l: 4L,\n    s: 2s\n}')
+    check('snbt: byte array', to_snbt(struct.pack('>i2b', 2, 1, -1), TAG_BYTE_ARRAY), '[B; 1B, -1B]')
+    check('snbt: int array', to_snbt(struct.pack('>i2i', 2, 1, 2), TAG_INT_ARRAY), '[I; 1, 2]')
+    check('snbt: long array', to_snbt(struct.pack('>iq', 1, 1), TAG_LONG_ARRAY), '[L; 1L]')
+    check('snbt: empty array', to_snbt(struct.pack('>i', 0), TAG_INT_ARRAY), '[I;]')
+    check('snbt: empty compound', to_snbt(compound()), '{}')
+    lists = compound(named(TAG_LIST, 'list', struct.pack('>bi2i', TAG_INT, 2, 1, 2)),
+                     named(TAG_LIST, 'empty', struct.pack('>bi', TAG_END, 0)))
+    check('snbt: lists', to_snbt(lists), '{\n    empty: [],\n    list: [\n        1,\n        2\n    ]\n}')
+    keys = compound(named(TAG_BYTE, 'minecraft:key', b'\1'), named(TAG_BYTE, 'a b', b'\2'),
+                    named(TAG_BYTE, 'Plain_key.1+-', b'\3'))
+    check('snbt: keys', to_snbt(keys), '{\n    Plain_key.1+-: 3b,\n    "a b": 2b,\n    "minecraft:key": 1b\n}')
+    # structure block layout: fixed key order and unindented entries
+    structure = compound(named(TAG_LIST, 'size', struct.pack('>bi3i', TAG_INT, 3, 1, 2, 3)),
+                         named(TAG_INT, 'DataVersion', struct.pack('>i', 3465)))
+    check('snbt: structure', to_snbt(structure), '{\n    DataVersion: 3465,\n    size: [1, 2, 3]\n}')
+
+
+RESET = '"bold":false,"italic":false,"underlined":false,"strikethrough":false,"obfuscated":false'
+# CraftChatMessage.fromJSONOrStringToJSON of a signed book page
+SIGNED_PAGES = (
+    ('Hello', '{"extra":[{"text":"Hello"}],"text":""}'),
+    ('', '{"text":""}'),
+    ('line 1\nline 2', '{"extra":[{"text":"line 1\\nline 2"}],"text":""}'),
+    ('\u00a7cRed', '{"extra":[{' + RESET + ',"color":"red","text":"Red"}],"text":""}'),
+    ('\u00a7lBold \u00a7rplain', '{"extra":[{"bold":true,"text":"Bold "},{' + RESET + ',"text":"plain"}],"text":""}'),
+    ('\u00a7x\u00a7f\u00a7f\u00a78\u00a70\u00a70\u00a70Hex',
+     '{"extra":[{' + RESET + ',"color":"#FF8000","text":"Hex"}],"text":""}'),
+    ('see example.com!', '{"extra":[{"text":"see "},{"clickEvent":{"action":"open_url","value":"http://example.com"},'
+                         '"text":"example.com"},{"text":"!"}],"text":""}'),
+    ('https://example.com/a', '{"extra":[{"clickEvent":{"action":"open_url","value":"https://example.com/a"},'
+                              '"text":"https://example.com/a"}],"text":""}'),
+    # valid json components are kept as they are
+    ('{"text":"hi"}', '{"text":"hi"}'),
+    ('"quoted"', '"quoted"'),
+    ('[{"text":"a"},"b"]', '[{"text":"a"},"b"]'),
+    # not a component for ChatSerializer or a strict gson reader
+    ('[]', '{"extra":[{"text":"[]"}],"text":""}'),
+    ('{"text":', '{"extra":[{"text":"{\\"text\\":"}],"text":""}'),
+    ('{"color":"red"}', '{"extra":[{"text":"{\\"color\\":\\"red\\"}"}],"text":""}'),
+    ('1.5x', '{"extra":[{"text":"1.5x"}],"text":""}'),
+    ('a' * 400, '{"extra":[{"text":"' + 'a' * 320 + '"}],"text":""}'),
+)
+# CraftMetaBook.validatePage of a writable book page, cut at 320 UTF-16 code units
+UNSIGNED_PAGES = (
+    ('\u00a7cRed', '\u00a7cRed'),
+    ('a' * 400, 'a' * 320),
+    ('a' * 319 + '\U0001f600', 'a' * 319 + '\ud83d'),
+    ('\U0001f600' * 160, '\U0001f600' * 160),
+)
+
+
+def check_chatmessage():
+    for page, expected in SIGNED_PAGES:
+        check(f'chatmessage: signed page {page[:40]!r}', chatmessage.signed_page(page), expected)
+    for page, expected in UNSIGNED_PAGES:
+        check(f'chatmessage: unsigned page {page[:40]!r}', chatmessage.unsigned_page(page), expected)
+
+
+def player_dat(name, game_mode=0, health=20.0, dimension='minecraft:overworld', data_version=3465, spawn=True):
+    # Gzipped player.dat with the tags the converter reads, an int dimension as saved before 1.16
+    if isinstance(dimension, int):
+        dimension_tag = named(TAG_INT, 'Dimension', struct.pack('>i', dimension))
+    else:
+        dimension_tag = named(TAG_STRING, 'Dimension', string(dimension))
+    stone = compound(named(TAG_BYTE, 'Slot', b'\0'), named(TAG_STRING, 'id', string('minecraft:stone')),
+                     named(TAG_BYTE, 'Count', b'\1'))
+    tags = [
+        named(TAG_INT, 'DataVersion', struct.pack('>i', data_version)),
+        named(TAG_INT, 'playerGameType', struct.pack('>i', game_mode)),
+        named(TAG_LIST, 'Inventory', struct.pack('>bi', TAG_COMPOUND, 1) + stone),
+        named(TAG_LIST, 'EnderItems', struct.pack('>bi', TAG_END, 0)),
+        dimension_tag,
+        named(TAG_LIST, 'Pos', struct.pack('>bi3d', TAG_DOUBLE, 3, 1.5, -61.0, 2.5)),
+        named(TAG_LIST, 'Rotation', struct.pack('>bi2f', TAG_FLOAT, 2, 90.0, 0.0)),
+        named(TAG_FLOAT, 'Health', struct.pack('>f', health)),
+        named(TAG_INT, 'foodLevel', struct.pack('>i', 20)),
+        named(TAG_FLOAT, 'foodSaturationLevel', struct.pack('>f', 5.0)),
+        named(TAG_FLOAT, 'foodExhaustionLevel', struct.pack('>f', 0.0)),
+        named(TAG_INT, 'XpLevel', struct.pack('>i', 3)),
+        named(TAG_FLOAT, 'XpP', struct.pack('>f', 0.5)),
+        named(TAG_INT, 'XpTotal', struct.pack('>i', 30)),
+        named(TAG_FLOAT, 'FallDistance', struct.pack('>f', 0.0)),
+        named(TAG_SHORT, 'Fire', struct.pack('>h', -20)),
+        named(TAG_SHORT, 'Air', struct.pack('>h', 300)),
+        named(TAG_COMPOUND, 'bukkit', compound(named(TAG_STRING, 'lastKnownName', string(name)))),
+    ]
+    if spawn:
+        tags += [named(TAG_INT, 'SpawnX', struct.pack('>i', 10)), named(TAG_INT, 'SpawnY', struct.pack('>i', 64)),
+                 named(TAG_INT, 'SpawnZ', struct.pack('>i', -10)), named(TAG_FLOAT, 'SpawnAngle', struct.pack('>f', 0.0))]
+        if data_version >= 2566:
+            tags.append(named(TAG_STRING, 'SpawnDimension', string('minecraft:overworld')))
+    return nbtreader.gzip_compress(named(TAG_COMPOUND, '', compound(*tags)))
+
+
+def player_uuid(number):
+    return f'00000000-0000-0000-0000-{number:012x}'
+
+
+def save_player(directory, number, data, mtime_ns=None):
+    # Through a temp file and a rename like the server, returns the path
+    path = os.path.join(directory, player_uuid(number) + '.dat')
+    with open(path + '.tmp', 'wb') as out_file:
+        out_file.write(data)
+    if mtime_ns is not None:
+        os.utime(path + '.tmp', ns=(mtime_ns, mtime_ns))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def quietly(fn, *args, **kwargs):
+    # Runs a batch without its summary on stderr
+    with contextlib.redirect_stderr(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def sha256_file(path):
+    with open(path, 'rb') as in_file:
+        return hashlib.sha256(in_file.read()).hexdigest()
+
+
+def check_manifest(directory):
+    source = os.path.join(directory, 'playerdata')
+    output = os.path.join(directory, 'json')
+    manifest_path = os.path.join(directory, 'manifest.json')
+    os.mkdir(source)
+    files = [save_player(source, number, player_dat(f'player{number}')) for number in range(3)]
+    quietly(convert.incremental_batch, files, manifest_path, 'world', output, workers=1)
+    entries = manifest.load(manifest_path)['files']
+    check('manifest: sha256 of the converted bytes', {path: entry['sha256'] for path, entry in entries.items()},
+          {path: sha256_file(path) for path in files})
+    check('manifest: outputs', sorted(entry['output'] for entry in entries.values()),
+          [os.path.join(output, f'player{number}.json') for number in range(3)])
+    check('manifest: unchanged', manifest.plan(files, entries, convert.CONVERTER_VERSION), ([], {}))
+    check('manifest: converter version', manifest.plan(files, entries, convert.CONVERTER_VERSION + 1)[0], files)
+
+    # player0 renamed (new size), player1 touched (same size, new mtime), player2 deleted
+    save_player(source, 0, player_dat('renamed0'))
+    mtime_ns = os.stat(files[1]).st_mtime_ns + 10 ** 9
+    os.utime(files[1], ns=(mtime_ns, mtime_ns))
+    os.remove(files[2])
+    changed, orphaned = manifest.plan(files[:2], entries, convert.CONVERTER_VERSION)
+    check('manifest: changed', changed, files[:2])
+    check('manifest: orphaned', list(orphaned), files[2:])
+    quietly(convert.incremental_batch, files[:2], manifest_path, 'world', output, workers=1)
+    check('manifest: outputs of renamed and deleted players removed', sorted(os.listdir(output)),
+          ['player1.json', 'renamed0.json'])
+    check('manifest: entries', sorted(manifest.load(manifest_path)['files']), files[:2])
+
+
+def check_shards(directory):
+    listing = [os.path.join(directory, player_uuid(number) + '.dat') for number in range(20)]
+    parts = [shards.select(listing, index, 3) for index in range(3)]
+    check('shards: select splits the listing', sorted(path for part in parts for path in part), listing)
+    paths = []
+    for index, part in enumerate(parts):
+        path = os.path.join(directory, shards.default_manifest_path(index, 3))
+        entries = {player_filename: {'sha256': player_filename} for player_filename in part[1:]}
+        failures = [(player_filename, 'MalformedFileError: test') for player_filename in part[:1] if index == 2]
+        if index != 2:
+            entries.update({player_filename: {'sha256': player_filename} for player_filename in part[:1]})
+        shards.write_manifest(path, (index, 3), listing, entries, failures, convert.CONVERTER_VERSION)
+        paths.append(path)
+    shard_manifests = [(path, manifest.load(path)) for path in paths]
+    failed = os.path.basename(parts[2][0])
+
+    merged, problems = shards.merge(shard_manifests)
+    check('shards: merged', (len(merged['files']), list(merged['errors'])), (19, [failed]))
+    check('shards: failed file', problems, [f'{failed}: MalformedFileError: test'])
+    _, problems = shards.merge(shard_manifests[:2])
+    check('shards: missing shard', problems,
+          ['missing shard(s) 2 of 3', f'{len(parts[0]) + len(parts[1])} file(s) covered, the directory listing has 20'])
+    _, problems = shards.merge(shard_manifests + shard_manifests[:1])
+    check('shards: shard merged twice', problems[0], f'{paths[0]}: shard 0 already merged from {paths[0]}')
+    path, data = shard_manifests[0]
+    stray = os.path.basename(parts[1][0])
+    _, problems = shards.merge([(path, dict(data, files=dict(data['files'], **{stray: {}})))] + shard_manifests[1:])
+    check('shards: file of another shard', problems[0], f'{path}: {stray} does not belong to shard 0')
+    _, problems = shards.merge([(path, dict(data, version=0))] + shard_manifests[1:])
+    check('shards: converter version', problems[0], f'{paths[1]}: version {convert.CONVERTER_VERSION} differs from 0')
+
+
+def check_merge(directory):
+    # One player on three servers: the newest save of a game mode wins whatever the source order
+    old, new, creative = (os.path.join(directory, source) for source in ('old', 'new', 'creative'))
+    for source in (old, new, creative):
+        os.mkdir(source)
+    save_player(old, 1, player_dat('OldName', health=10.0), mtime_ns=10 ** 18)
+    save_player(new, 1, player_dat('NewName', health=5.0), mtime_ns=2 * 10 ** 18)
+    save_player(creative, 1, player_dat('OldName', game_mode=1, health=15.0), mtime_ns=10 ** 18)
+    mv_data = os.path.join(directory, 'mv')
+    sources = [(new, 'world', 'shared'), (old, 'world', 'shared'), (creative, 'world', None)]
+    converted, failures = quietly(merge.merge, sources, mv_data, workers=1)
+    check('merge: converted', (list(converted), failures), ([player_uuid(1)], []))
+
+    world = mvinv.read_json(os.path.join(mv_data, 'worlds', 'world', 'NewName.json')) or {}
+    check('merge: world game modes', sorted(world), ['CREATIVE', 'SURVIVAL'])
+    check('merge: newest survival wins', world.get('SURVIVAL', {}).get('stats', {}).get('hp'), '5.0')
+    check('merge: creative of another source', world.get('CREATIVE', {}).get('stats', {}).get('hp'), '15.0')
+    group = mvinv.read_json(os.path.join(mv_data, 'groups', 'shared', 'NewName.json')) or {}
+    check('merge: group', {game_mode: section['stats']['hp'] for game_mode, section in group.items()},
+          {'SURVIVAL': '5.0'})
+    check('merge: global profile', mvinv.read_json(os.path.join(mv_data, 'players', 'NewName.json')),
+          {'playerData': {'lastKnownName': 'NewName', 'lastWorld': 'world', 'shouldLoad': True}})
+    check('merge: no profile of the old name', os.path.exists(os.path.join(mv_data, 'players', 'OldName.json')),
+          False)
+
+
+def check_watch(directory):
+    # Poll times are passed in, so the debounce is checked without sleeping
+    a = save_player(directory, 1, player_dat('a'))
+    watcher = watch.Watcher(directory, debounce=2.0)
+    check('watch: baseline', watcher.start(), [a])
+    check('watch: baseline not converted', watcher.poll(0.0), [])
+
+    b = save_player(directory, 2, player_dat('b'))
+    with open(os.path.join(directory, player_uuid(3) + '.dat.tmp'), 'wb'), open(a + '_old', 'wb'):
+        pass
+    check('watch: new file waits', watcher.poll(10.0), [])
+    check('watch: new file still waits', watcher.poll(11.0), [])
+    save_player(directory, 2, player_dat('bb'))
+    check('watch: rewrite seen', watcher.poll(12.0), [])
+    check('watch: rewrite restarts the debounce', watcher.poll(13.0), [])
+    check('watch: ready after the debounce', watcher.poll(14.0), [b])
+    watcher.settle(b)
+    check('watch: settled', watcher.poll(20.0), [])
+
+    save_player(directory, 1, player_dat('aa'))
+    check('watch: replaced file waits', watcher.poll(30.0), [])
+    check('watch: replaced file ready', watcher.poll(32.0), [a])
+    watcher.settle(a)
+    save_player(directory, 2, player_dat('bbb'))
+    check('watch: rewritten again', watcher.poll(40.0), [])
+    os.remove(b)
+    check('watch: deleted while pending', (watcher.poll(45.0), list(watcher.pending)), ([], []))
+
+
+def run_client(*args):
+    # (exit code, stdout, stderr) of daemon_client
+    out_file = io.StringIO()
+    err_file = io.StringIO()
+    with contextlib.redirect_stdout(out_file), contextlib.redirect_stderr(err_file):
+        code = daemon_client.main(list(args))
+    return code, out_file.getvalue(), err_file.getvalue()
+
+
+def check_daemon(directory):
+    good = save_player(directory, 1, player_dat('Steve'))
+    bad = os.path.join(directory, player_uuid(2) + '.dat')
+    with open(bad, 'wb') as out_file:
+        out_file.write(b'not a player file')
+    socket_path = os.path.join(directory, 'daemon.sock')
+    # Threads instead of the process pool, the protocol is the same
+    with ThreadPoolExecutor(2) as executor:
+        server = daemon.Server(socket_path, executor)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            code, out, err = run_client(good, bad, good, '-w', 'survival', '--socket', socket_path)
+            responses = [json.loads(line) for line in out.splitlines()]
+            check('daemon: exit code of a failed file', code, 1)
+            check('daemon: responses in request order', [list(response) for response in responses],
+                  [['SURVIVAL'], ['SURVIVAL']])
+            check('daemon: world', responses[0]['SURVIVAL']['lastLocation']['world'], 'survival')
+            check('daemon: error', err.startswith(f'{bad}: MalformedFileError'), True)
+
+            output = os.path.join(directory, 'json')
+            check('daemon: -o', run_client(good, '-o', output, '--socket', socket_path),
+                  (0, os.path.join(output, 'Steve.json') + '\n', ''))
+            check('daemon: -o file', os.path.exists(os.path.join(output, 'Steve.json')), True)
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                sock.sendall(b'{"world": "world"}\n')
+                sock.shutdown(socket.SHUT_WR)
+                with sock.makefile('rb') as in_file:
+                    response = json.loads(in_file.readline())
+            check('daemon: bad request', response, {'ok': False, 'error': "Bad request: KeyError: 'path'"})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    # A daemon which dies after the first response
+    socket_path = os.path.join(directory, 'closing.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen(1)
+
+        def answer_one():
+            connection, _ = listener.accept()
+            with connection, connection.makefile('rb') as in_file:
+                in_file.readline()
+                connection.sendall(b'{"ok": true, "path": "Steve.json"}\n')
+
+        thread = threading.Thread(target=answer_one, daemon=True)
+        thread.start()
+        code, out, err = run_client(good, bad, '--socket', socket_path)
+        thread.join()
+    check('daemon: unanswered files fail', (code, out, err),
+          (1, 'Steve.json\n', f'{bad}: no response, the daemon closed the connection\n'))
+
+
+def check_columns(directory):
+    try:
+        import numpy
+    except ImportError:
+        print('numpy not installed, skipped the .npz export checks')
+        return
+    nether = save_player(directory, 1, player_dat('Nether', dimension='minecraft:the_nether'))
+    legacy = save_player(directory, 2, player_dat('Legacy', dimension=-1, data_version=2230, spawn=False))
+    path = os.path.join(directory, 'players.npz')
+    quietly(columns.export, [nether, legacy], path, workers=1)
+    with numpy.load(path) as data:
+        check('columns: arrays', sorted(data.files), sorted([*columns.COLUMNS, 'uuid', 'name', 'dimension_names']))
+        check('columns: dtypes', {column: data[column].dtype for column in columns.COLUMNS},
+              {column: numpy.dtype(bool if column == 'has_spawn' else typecode)
+               for column, typecode in columns.COLUMNS.items()})
+        check('columns: rows', (data['uuid'].tolist(), data['name'].tolist()),
+              ([player_uuid(1), player_uuid(2)], ['Nether', 'Legacy']))
+        check('columns: dimension names', data['dimension_names'].tolist(), list(columns.DIMENSIONS))
+        check('columns: numeric dimension coded by name', data['dimension'].tolist(), [1, 1])
+        check('columns: spawn', (data['has_spawn'].tolist(), data['spawn_x'].tolist(),
+                                 data['spawn_dimension'].tolist()), ([True, False], [10, 0], [0, 0]))
+        check('columns: position', data['y'].tolist(), [-61.0, -61.0])
+
+
+def check_tools():
+    for check_fn in (check_manifest, check_shards, check_merge, check_watch, check_daemon, check_columns):
+        with tempfile.TemporaryDirectory() as directory:
+            check_fn(directory)
+
+
+def main():
+    check_nbtreader()
+    check_snbt()
+    check_chatmessage()
+    check_tools()
+    if failures:
+        print(f'{len(failures)} check(s) failed')
+        return 1
+    print('all checks passed')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
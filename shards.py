@@ -0,0 +1,114 @@
+import os
+import sys
+import hashlib
+import argparse
+
+import manifest
+
+# Splitting one playerdata directory between machines:
+#   python ./convert.py <playerdata dir> [MVWorld] --shard I/N [--shard-manifest FILE]   (0 <= I < N, on each machine)
+#   python ./shards.py SHARD_MANIFEST... [-o MERGED]
+# A file belongs to the shard picked by the hash of its file name (the player uuid), so every machine with a copy of
+# the directory agrees on the split whatever the mount path. Shard manifests are keyed by file name:
+# {'manifest': MANIFEST_VERSION, 'shard': I, 'shards': N, 'version': converter version,
+#  'listing': {'files': count, 'sha256': hash of the sorted file names of the whole directory},
+#  'files': {file name: manifest entry}, 'errors': {file name: error}}
+
+
+def parse_shard(value):
+    # 'I/N' -> (I, N)
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must be 'I/N', got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f'shard index must be in 0..{count - 1}, got {index}')
+    return index, count
+
+
+def shard_of(player_filename, count):
+    name = os.path.basename(player_filename).lower().encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(name, digest_size=8).digest(), 'big') % count
+
+
+def select(player_filenames, index, count):
+    return [player_filename for player_filename in player_filenames if shard_of(player_filename, count) == index]
+
+
+def listing_info(player_filenames):
+    names = sorted(os.path.basename(player_filename) for player_filename in player_filenames)
+    return {'files': len(names), 'sha256': hashlib.sha256('\n'.join(names).encode('utf-8')).hexdigest()}
+
+
+def default_manifest_path(index, count):
+    return f'shard-{index}-of-{count}.json'
+
+
+def write_manifest(path, shard, listing, entries, failures, version):
+    # entries: {source path: manifest entry} of the converted files, failures: [(source path, error)]
+    index, count = shard
+    manifest.save(path, {
+        'shard': index,
+        'shards': count,
+        'version': version,
+        'listing': listing_info(listing),
+        'files': {os.path.basename(player_filename): entry for player_filename, entry in entries.items()},
+        'errors': {os.path.basename(player_filename): error for player_filename, error in failures},
+    })
+
+
+def merge(shard_manifests):
+    # Returns the merged manifest and the list of coverage problems, empty if every file of the listing was
+    # converted by exactly one shard
+    problems = []
+    merged = {'files': {}, 'errors': {}}
+    shards = {}
+    for path, data in shard_manifests:
+        if not data or 'shard' not in data:
+            problems.append(f'{path}: not a shard manifest of this converter')
+            continue
+        for key in ('shards', 'listing', 'version'):
+            if merged.setdefault(key, data[key]) != data[key]:
+                problems.append(f'{path}: {key} {data[key]} differs from {merged[key]}')
+        if data['shard'] in shards:
+            problems.append(f'{path}: shard {data["shard"]} already merged from {shards[data["shard"]]}')
+            continue
+        shards[data['shard']] = path
+        for name in (*data['files'], *data['errors']):
+            if shard_of(name, data['shards']) != data['shard']:
+                problems.append(f'{path}: {name} does not belong to shard {data["shard"]}')
+        merged['files'].update(data['files'])
+        merged['errors'].update(data['errors'])
+
+    count = merged.get('shards', 0)
+    missing = sorted(set(range(count)) - shards.keys())
+    if missing:
+        problems.append(f'missing shard(s) {", ".join(map(str, missing))} of {count}')
+    for name in merged['errors']:
+        problems.append(f'{name}: {merged["errors"][name]}')
+    covered = len(merged['files']) + len(merged['errors'])
+    expected = merged.get('listing', {}).get('files', 0)
+    if covered != expected:
+        problems.append(f'{covered} file(s) covered, the directory listing has {expected}')
+    return merged, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge shard manifests and verify that they cover every file')
+    parser.add_argument('manifests', nargs='+', help='shard manifest files written by convert.py --shard')
+    parser.add_argument('-o', '--output', metavar='MERGED', help='write the merged manifest into MERGED')
+    args = parser.parse_args(argv)
+
+    merged, problems = merge([(path, manifest.load(path)) for path in args.manifests])
+    if args.output:
+        manifest.save(args.output, merged)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    print(f'{len(merged["files"])} converted, {len(merged["errors"])} failed of '
+          f'{merged.get("listing", {}).get("files", 0)} file(s) in {merged.get("shards", 0)} shard(s): '
+          f'{"incomplete" if problems else "complete"}')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
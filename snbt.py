@@ -0,0 +1,194 @@
+import re
+import math
+import struct
+import decimal
+import functools
+
+import nbtreader
+from nbtreader import (TAG_BYTE, TAG_SHORT, TAG_INT, TAG_LONG, TAG_FLOAT, TAG_DOUBLE, TAG_BYTE_ARRAY, TAG_STRING,
+                       TAG_LIST, TAG_COMPOUND, TAG_INT_ARRAY, TAG_LONG_ARRAY)
+
+# Port of net.minecraft.nbt.SnbtPrinterTagVisitor, used by CraftNBTTagConfigSerializer.serialize
+# https://hub.spigotmc.org/stash/projects/SPIGOT/repos/craftbukkit/browse/src/main/java/org/bukkit/craftbukkit/util/CraftNBTTagConfigSerializer.java
+
+INDENTATION = '    '
+KEY_ORDER = {
+    '{}': ('DataVersion', 'author', 'size', 'data', 'entities', 'palette', 'palettes'),
+    '{}.data.[].{}': ('pos', 'state', 'nbt'),
+    '{}.entities.[].{}': ('blockPos', 'pos'),
+}
+NO_INDENTATION = {'{}.size.[]', '{}.data.[].{}', '{}.palette.[].{}', '{}.entities.[].{}'}
+SIMPLE_VALUE = re.compile(r'[A-Za-z0-9._+-]+')
+NUMBER_SUFFIXES = {
+    TAG_BYTE: 'b',
+    TAG_SHORT: 's',
+    TAG_INT: '',
+    TAG_LONG: 'L',
+}
+ARRAY_PREFIXES = {
+    TAG_BYTE_ARRAY: ('B', 'B'),
+    TAG_INT_ARRAY: ('I', ''),
+    TAG_LONG_ARRAY: ('L', 'L'),
+}
+CACHE_SIZE = 4096
+
+_float = struct.Struct('>f')
+
+
+def quote_and_escape(text):
+    # net.minecraft.nbt.StringTag.quoteAndEscape: double quotes unless the text has a double quote before
+    # any single quote
+    quote = None
+    result = []
+    for char in text:
+        if char == '\\':
+            result.append('\\')
+        elif char == '"' or char == "'":
+            if quote is None:
+                quote = "'" if char == '"' else '"'
+            if quote == char:
+                result.append('\\')
+        result.append(char)
+    quote = quote or '"'
+    return quote + ''.join(result) + quote
+
+
+def escape_key(key):
+    return key if SIMPLE_VALUE.fullmatch(key) else quote_and_escape(key)
+
+
+def java_number(digits, exponent, negative):
+    # Float.toString/Double.toString layout of value = 0.digits * 10^(exponent + 1)
+    sign = '-' if negative else ''
+    if -3 <= exponent < 7:
+        if exponent >= 0:
+            whole = (digits[:exponent + 1]).ljust(exponent + 1, '0')
+            fraction = digits[exponent + 1:] or '0'
+        else:
+            whole = '0'
+            fraction = '0' * (-exponent - 1) + digits
+        return f'{sign}{whole}.{fraction}'
+    return f'{sign}{digits[0]}.{digits[1:] or "0"}E{exponent}'
+
+
+def java_float_string(value, single=False):
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    if value == 0:
+        return '-0.0' if math.copysign(1.0, value) < 0 else '0.0'
+    # Shortest decimal which reads back as the same value, but with at least two significant digits, of which Java
+    # takes the closest to the exact value: Float.MIN_VALUE is 1.4E-45, not 1.0E-45
+    if single:
+        # rounding up near Float.MAX_VALUE overflows
+        for precision in range(2, 10):
+            text = f'{value:.{precision - 1}e}'
+            try:
+                if _float.unpack(_float.pack(float(text)))[0] == value:
+                    break
+            except OverflowError:
+                pass
+    else:
+        text = repr(value)
+    sign, digits, exponent = decimal.Decimal(text).normalize().as_tuple()
+    if len(digits) == 1 and not single:
+        sign, digits, exponent = decimal.Decimal(f'{value:.1e}').normalize().as_tuple()
+    digits = ''.join(map(str, digits))
+    return java_number(digits, exponent + len(digits) - 1, sign)
+
+
+def tag_type(tag):
+    # Parsed nodes and nbt library tags both carry the tag type as .id
+    return tag.id
+
+
+def compound_items(tag):
+    if isinstance(tag, dict):
+        return tag.items()
+    return ((child.name, child) for child in tag.tags)
+
+
+class Printer:
+    def __init__(self, indentation=INDENTATION, depth=0, path=None):
+        self.indentation = indentation
+        self.depth = depth
+        self.path = path if path is not None else []
+
+    def path_string(self):
+        return '.'.join(self.path)
+
+    def visit(self, tag):
+        tag_id = tag_type(tag)
+        if tag_id in NUMBER_SUFFIXES:
+            return f'{tag.value}{NUMBER_SUFFIXES[tag_id]}'
+        if tag_id == TAG_FLOAT:
+            return java_float_string(tag.value, single=True) + 'f'
+        if tag_id == TAG_DOUBLE:
+            return java_float_string(tag.value) + 'd'
+        if tag_id == TAG_STRING:
+            return quote_and_escape(tag.value)
+        if tag_id in ARRAY_PREFIXES:
+            return self.visit_array(tag_id, tag)
+        if tag_id == TAG_LIST:
+            return self.visit_list(tag)
+        if tag_id == TAG_COMPOUND:
+            return self.visit_compound(tag)
+        raise ValueError(f'Unrecognised tag type {tag_id}')
+
+    def visit_array(self, tag_id, tag):
+        prefix, suffix = ARRAY_PREFIXES[tag_id]
+        return f'[{prefix};' + ','.join(f' {value}{suffix}' for value in tag) + ']'
+
+    def visit_list(self, tag):
+        if len(tag) == 0:
+            return '[]'
+        self.path.append('[]')
+        indentation = '' if self.path_string() in NO_INDENTATION else self.indentation
+        separator = ',' + (indentation and '\n' or ' ')
+        items = [indentation * (self.depth + 1) + Printer(indentation, self.depth + 1, self.path).visit(item)
+                 for item in tag]
+        self.path.pop()
+        return self.wrap('[', separator.join(items), ']', indentation)
+
+    def visit_compound(self, tag):
+        children = dict(compound_items(tag))
+        if not children:
+            return '{}'
+        self.path.append('{}')
+        indentation = '' if self.path_string() in NO_INDENTATION else self.indentation
+        separator = ',' + (indentation and '\n' or ' ')
+        entries = []
+        for key in self.ordered_keys(children):
+            self.path.append(key)
+            value = Printer(indentation, self.depth + 1, self.path).visit(children[key])
+            self.path.pop()
+            entries.append(f'{indentation * (self.depth + 1)}{escape_key(key)}: {value}')
+        self.path.pop()
+        return self.wrap('{', separator.join(entries), '}', indentation)
+
+    def ordered_keys(self, children):
+        keys = set(children)
+        order = KEY_ORDER.get(self.path_string())
+        if order is None:
+            return sorted(keys)
+        result = [key for key in order if key in keys]
+        return result + sorted(keys.difference(result))
+
+    def wrap(self, open_char, body, close_char, indentation):
+        if not indentation:
+            return open_char + body + close_char
+        return f'{open_char}\n{body}\n{indentation * self.depth}{close_char}'
+
+
+def to_snbt(tag):
+    # Memoized by the tag's source bytes: items share a handful of block states
+    if isinstance(tag, nbtreader.Node):
+        return payload_to_snbt(tag.id, bytes(tag.raw()))
+    return Printer().visit(tag)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def payload_to_snbt(tag_id, payload):
+    node, _ = nbtreader.parse_payload(memoryview(payload), 0, tag_id)
+    return Printer().visit(node)
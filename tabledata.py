@@ -0,0 +1,186 @@
+# Source of the tables of tables.py, imported only to compile its snapshot.
+# https://minecraft.wiki/w/Data_version
+# Names and ids read from player.dat -> Bukkit names of the target server, LEGACY_TABLES lists what files saved by
+# older game versions read differently. The snapshot is rebuilt when this file changes.
+
+ENCHANTMENTS = {
+    'protection': 'PROTECTION_ENVIRONMENTAL',
+    'fire_protection': 'PROTECTION_FIRE',
+    'feather_falling': 'PROTECTION_FALL',
+    'blast_protection': 'PROTECTION_EXPLOSIONS',
+    'projectile_protection': 'PROTECTION_PROJECTILE',
+    'respiration': 'OXYGEN',
+    'aqua_affinity': 'WATER_WORKER',
+    'sharpness': 'DAMAGE_ALL',
+    'smite': 'DAMAGE_UNDEAD',
+    'bane_of_arthropods': 'DAMAGE_ARTHROPODS',
+    'looting': 'LOOT_BONUS_MOBS',
+    'sweeping': 'SWEEPING_EDGE',
+    'efficiency': 'DIG_SPEED',
+    'unbreaking': 'DURABILITY',
+    'fortune': 'LOOT_BONUS_BLOCKS',
+    'power': 'ARROW_DAMAGE',
+    'punch': 'ARROW_KNOCKBACK',
+    'flame': 'ARROW_FIRE',
+    'infinity': 'ARROW_INFINITE',
+    'luck_of_the_sea': 'LUCK',
+}
+
+DYE_COLORS = ('WHITE', 'ORANGE', 'MAGENTA', 'LIGHT_BLUE', 'YELLOW', 'LIME', 'PINK', 'GRAY',
+              'LIGHT_GRAY', 'CYAN', 'PURPLE', 'BLUE', 'BROWN', 'GREEN', 'RED', 'BLACK')
+
+FIREWORK_TYPES = ('BALL', 'BALL_LARGE', 'STAR', 'CREEPER', 'BURST')
+
+# HideFlags bit -> ItemFlag, in the order of the serialized list
+# https://hub.spigotmc.org/stash/projects/SPIGOT/repos/bukkit/browse/src/main/java/org/bukkit/inventory/ItemFlag.java
+ITEM_FLAGS = (
+    (1 << 7, 'HIDE_ARMOR_TRIM'),
+    (1 << 6, 'HIDE_DYE'),
+    (1 << 5, 'HIDE_POTION_EFFECTS'),
+    (1 << 4, 'HIDE_PLACED_ON'),
+    (1 << 3, 'HIDE_DESTROYS'),
+    (1 << 2, 'HIDE_UNBREAKABLE'),
+    (1 << 1, 'HIDE_ATTRIBUTES'),
+    (1 << 0, 'HIDE_ENCHANTS'),
+)
+
+# Dimension -> suffix of the Multiverse world name
+DIMENSIONS = {
+    'minecraft:overworld': '',
+    'minecraft:the_nether': '_nether',
+    'minecraft:the_end': '_the_end',
+}
+
+# Meta kind (serialize_meta_<kind> in convert.py) -> materials
+META_MATERIALS = {
+    'book_signed': ('WRITTEN_BOOK',),
+    'book': ('WRITABLE_BOOK',),
+    'skull': (
+        'CREEPER_HEAD', 'CREEPER_WALL_HEAD', 'DRAGON_HEAD', 'DRAGON_WALL_HEAD', 'PIGLIN_HEAD', 'PIGLIN_WALL_HEAD',
+        'PLAYER_HEAD', 'PLAYER_WALL_HEAD', 'SKELETON_SKULL', 'SKELETON_WALL_SKULL', 'WITHER_SKELETON_SKULL',
+        'WITHER_SKELETON_WALL_SKULL', 'ZOMBIE_HEAD', 'ZOMBIE_WALL_HEAD',),
+    'armor': (
+        'CHAINMAIL_HELMET', 'CHAINMAIL_CHESTPLATE', 'CHAINMAIL_LEGGINGS', 'CHAINMAIL_BOOTS', 'DIAMOND_HELMET',
+        'DIAMOND_CHESTPLATE', 'DIAMOND_LEGGINGS', 'DIAMOND_BOOTS', 'GOLDEN_HELMET', 'GOLDEN_CHESTPLATE',
+        'GOLDEN_LEGGINGS', 'GOLDEN_BOOTS', 'IRON_HELMET', 'IRON_CHESTPLATE', 'IRON_LEGGINGS', 'IRON_BOOTS',
+        'NETHERITE_HELMET', 'NETHERITE_CHESTPLATE', 'NETHERITE_LEGGINGS', 'NETHERITE_BOOTS', 'TURTLE_HELMET',),
+    'colorable_armor': ('LEATHER_HELMET', 'LEATHER_CHESTPLATE', 'LEATHER_LEGGINGS', 'LEATHER_BOOTS',),
+    'leather_armor': ('LEATHER_HORSE_ARMOR',),
+    'potion': ('POTION', 'SPLASH_POTION', 'LINGERING_POTION', 'TIPPED_ARROW',),
+    'map': ('FILLED_MAP',),
+    'firework': ('FIREWORK_ROCKET',),
+    'charge': ('FIREWORK_STAR',),
+    'enchanted_book': ('ENCHANTED_BOOK',),
+    'banner': (
+        'BLACK_BANNER', 'BLACK_WALL_BANNER', 'BLUE_BANNER', 'BLUE_WALL_BANNER', 'BROWN_BANNER', 'BROWN_WALL_BANNER',
+        'CYAN_BANNER', 'CYAN_WALL_BANNER', 'GRAY_BANNER', 'GRAY_WALL_BANNER', 'GREEN_BANNER', 'GREEN_WALL_BANNER',
+        'LIGHT_BLUE_BANNER', 'LIGHT_BLUE_WALL_BANNER', 'LIGHT_GRAY_BANNER', 'LIGHT_GRAY_WALL_BANNER', 'LIME_BANNER',
+        'LIME_WALL_BANNER', 'MAGENTA_BANNER', 'MAGENTA_WALL_BANNER', 'ORANGE_BANNER', 'ORANGE_WALL_BANNER',
+        'PINK_BANNER', 'PINK_WALL_BANNER', 'PURPLE_BANNER', 'PURPLE_WALL_BANNER', 'RED_BANNER', 'RED_WALL_BANNER',
+        'WHITE_BANNER', 'WHITE_WALL_BANNER', 'YELLOW_BANNER', 'YELLOW_WALL_BANNER',),
+    'spawn_egg': (
+        'ALLAY_SPAWN_EGG', 'AXOLOTL_SPAWN_EGG', 'BAT_SPAWN_EGG', 'BEE_SPAWN_EGG', 'BLAZE_SPAWN_EGG', 'BREEZE_SPAWN_EGG',
+        'CAT_SPAWN_EGG', 'CAMEL_SPAWN_EGG', 'CAVE_SPIDER_SPAWN_EGG', 'CHICKEN_SPAWN_EGG', 'COD_SPAWN_EGG',
+        'COW_SPAWN_EGG', 'CREEPER_SPAWN_EGG', 'DOLPHIN_SPAWN_EGG', 'DONKEY_SPAWN_EGG', 'DROWNED_SPAWN_EGG',
+        'ELDER_GUARDIAN_SPAWN_EGG', 'ENDER_DRAGON_SPAWN_EGG', 'ENDERMAN_SPAWN_EGG', 'ENDERMITE_SPAWN_EGG',
+        'EVOKER_SPAWN_EGG', 'FOX_SPAWN_EGG', 'FROG_SPAWN_EGG', 'GHAST_SPAWN_EGG', 'GLOW_SQUID_SPAWN_EGG',
+        'GOAT_SPAWN_EGG', 'GUARDIAN_SPAWN_EGG', 'HOGLIN_SPAWN_EGG', 'HORSE_SPAWN_EGG', 'HUSK_SPAWN_EGG',
+        'IRON_GOLEM_SPAWN_EGG', 'LLAMA_SPAWN_EGG', 'MAGMA_CUBE_SPAWN_EGG', 'MOOSHROOM_SPAWN_EGG', 'MULE_SPAWN_EGG',
+        'OCELOT_SPAWN_EGG', 'PANDA_SPAWN_EGG', 'PARROT_SPAWN_EGG', 'PHANTOM_SPAWN_EGG', 'PIGLIN_BRUTE_SPAWN_EGG',
+        'PIGLIN_SPAWN_EGG', 'PIG_SPAWN_EGG', 'PILLAGER_SPAWN_EGG', 'POLAR_BEAR_SPAWN_EGG', 'PUFFERFISH_SPAWN_EGG',
+        'RABBIT_SPAWN_EGG', 'RAVAGER_SPAWN_EGG', 'SALMON_SPAWN_EGG', 'SHEEP_SPAWN_EGG', 'SHULKER_SPAWN_EGG',
+        'SILVERFISH_SPAWN_EGG', 'SKELETON_HORSE_SPAWN_EGG', 'SKELETON_SPAWN_EGG', 'SLIME_SPAWN_EGG',
+        'SNIFFER_SPAWN_EGG', 'SNOW_GOLEM_SPAWN_EGG', 'SPIDER_SPAWN_EGG', 'SQUID_SPAWN_EGG', 'STRAY_SPAWN_EGG',
+        'STRIDER_SPAWN_EGG', 'TADPOLE_SPAWN_EGG', 'TRADER_LLAMA_SPAWN_EGG', 'TROPICAL_FISH_SPAWN_EGG',
+        'TURTLE_SPAWN_EGG', 'VEX_SPAWN_EGG', 'VILLAGER_SPAWN_EGG', 'VINDICATOR_SPAWN_EGG', 'WANDERING_TRADER_SPAWN_EGG',
+        'WARDEN_SPAWN_EGG', 'WITCH_SPAWN_EGG', 'WITHER_SKELETON_SPAWN_EGG', 'WITHER_SPAWN_EGG', 'WOLF_SPAWN_EGG',
+        'ZOGLIN_SPAWN_EGG', 'ZOMBIE_HORSE_SPAWN_EGG', 'ZOMBIE_SPAWN_EGG', 'ZOMBIE_VILLAGER_SPAWN_EGG',
+        'ZOMBIFIED_PIGLIN_SPAWN_EGG',),
+    'armor_stand': ('ARMOR_STAND',),
+    'knowledge_book': ('KNOWLEDGE_BOOK',),
+    'block_state': (
+        'FURNACE', 'CHEST', 'TRAPPED_CHEST', 'JUKEBOX', 'DISPENSER', 'DROPPER', 'ACACIA_HANGING_SIGN', 'ACACIA_SIGN',
+        'ACACIA_WALL_HANGING_SIGN', 'ACACIA_WALL_SIGN', 'BAMBOO_HANGING_SIGN', 'BAMBOO_SIGN',
+        'BAMBOO_WALL_HANGING_SIGN', 'BAMBOO_WALL_SIGN', 'BIRCH_HANGING_SIGN', 'BIRCH_SIGN', 'BIRCH_WALL_HANGING_SIGN',
+        'BIRCH_WALL_SIGN', 'CHERRY_HANGING_SIGN', 'CHERRY_SIGN', 'CHERRY_WALL_HANGING_SIGN', 'CHERRY_WALL_SIGN',
+        'CRIMSON_HANGING_SIGN', 'CRIMSON_SIGN', 'CRIMSON_WALL_HANGING_SIGN', 'CRIMSON_WALL_SIGN',
+        'DARK_OAK_HANGING_SIGN', 'DARK_OAK_SIGN', 'DARK_OAK_WALL_HANGING_SIGN', 'DARK_OAK_WALL_SIGN',
+        'JUNGLE_HANGING_SIGN', 'JUNGLE_SIGN', 'JUNGLE_WALL_HANGING_SIGN', 'JUNGLE_WALL_SIGN', 'MANGROVE_HANGING_SIGN',
+        'MANGROVE_SIGN', 'MANGROVE_WALL_HANGING_SIGN', 'MANGROVE_WALL_SIGN', 'OAK_HANGING_SIGN', 'OAK_SIGN',
+        'OAK_WALL_HANGING_SIGN', 'OAK_WALL_SIGN', 'SPRUCE_HANGING_SIGN', 'SPRUCE_SIGN', 'SPRUCE_WALL_HANGING_SIGN',
+        'SPRUCE_WALL_SIGN', 'WARPED_HANGING_SIGN', 'WARPED_SIGN', 'WARPED_WALL_HANGING_SIGN', 'WARPED_WALL_SIGN',
+        'SPAWNER', 'BREWING_STAND', 'ENCHANTING_TABLE', 'COMMAND_BLOCK', 'REPEATING_COMMAND_BLOCK',
+        'CHAIN_COMMAND_BLOCK', 'BEACON', 'DAYLIGHT_DETECTOR', 'HOPPER', 'COMPARATOR', 'SHIELD', 'STRUCTURE_BLOCK',
+        'SHULKER_BOX', 'WHITE_SHULKER_BOX', 'ORANGE_SHULKER_BOX', 'MAGENTA_SHULKER_BOX', 'LIGHT_BLUE_SHULKER_BOX',
+        'YELLOW_SHULKER_BOX', 'LIME_SHULKER_BOX', 'PINK_SHULKER_BOX', 'GRAY_SHULKER_BOX', 'LIGHT_GRAY_SHULKER_BOX',
+        'CYAN_SHULKER_BOX', 'PURPLE_SHULKER_BOX', 'BLUE_SHULKER_BOX', 'BROWN_SHULKER_BOX', 'GREEN_SHULKER_BOX',
+        'RED_SHULKER_BOX', 'BLACK_SHULKER_BOX', 'ENDER_CHEST', 'BARREL', 'BELL', 'BLAST_FURNACE', 'CAMPFIRE',
+        'SOUL_CAMPFIRE', 'JIGSAW', 'LECTERN', 'SMOKER', 'BEEHIVE', 'BEE_NEST', 'SCULK_CATALYST', 'SCULK_SHRIEKER',
+        'SCULK_SENSOR', 'CALIBRATED_SCULK_SENSOR', 'CHISELED_BOOKSHELF', 'DECORATED_POT', 'SUSPICIOUS_SAND',
+        'SUSPICIOUS_GRAVEL', 'CRAFTER', 'TRIAL_SPAWNER',),
+    'tropical_fish_bucket': ('TROPICAL_FISH_BUCKET',),
+    'axolotl_bucket': ('AXOLOTL_BUCKET',),
+    'crossbow': ('CROSSBOW',),
+    'suspicious_stew': ('SUSPICIOUS_STEW',),
+    'entity_tag': ('COD_BUCKET', 'PUFFERFISH_BUCKET', 'SALMON_BUCKET', 'ITEM_FRAME', 'GLOW_ITEM_FRAME', 'PAINTING',),
+    'compass': ('COMPASS',),
+    'bundle': ('BUNDLE',),
+    'music_instrument': ('GOAT_HORN',),
+}
+
+# (first DataVersion of a change, tables of the files saved before it), newest first.
+# Older files get every entry they predate, meta materials add to the newer ones.
+LEGACY_TABLES = (
+    # 1.16: namespaced dimension ids, zombie pigmen became zombified piglins, namespaced snake case attribute names
+    # and int array modifier uuids (older modifiers have UUIDMost and UUIDLeast, see convert.serialize_modifiers)
+    (2566, {
+        'dimensions': {0: '', -1: '_nether', 1: '_the_end'},
+        'meta_materials': {'spawn_egg': ('ZOMBIE_PIGMAN_SPAWN_EGG',)},
+        'attribute_names': {
+            'generic.maxHealth': 'GENERIC_MAX_HEALTH',
+            'generic.followRange': 'GENERIC_FOLLOW_RANGE',
+            'generic.knockbackResistance': 'GENERIC_KNOCKBACK_RESISTANCE',
+            'generic.movementSpeed': 'GENERIC_MOVEMENT_SPEED',
+            'generic.flyingSpeed': 'GENERIC_FLYING_SPEED',
+            'generic.attackDamage': 'GENERIC_ATTACK_DAMAGE',
+            'generic.attackKnockback': 'GENERIC_ATTACK_KNOCKBACK',
+            'generic.attackSpeed': 'GENERIC_ATTACK_SPEED',
+            'generic.armor': 'GENERIC_ARMOR',
+            'generic.armorToughness': 'GENERIC_ARMOR_TOUGHNESS',
+            'generic.luck': 'GENERIC_LUCK',
+            'horse.jumpStrength': 'HORSE_JUMP_STRENGTH',
+            'zombie.spawnReinforcements': 'ZOMBIE_SPAWN_REINFORCEMENTS',
+        },
+    }),
+    # 1.14: one sign per wood type
+    (1952, {
+        'meta_materials': {'block_state': ('SIGN', 'WALL_SIGN')},
+    }),
+)
+
+
+def build_table_set(legacy_tables):
+    # Returns (dimensions, meta kinds, attribute names) for files predating the given LEGACY_TABLES entries
+    dimensions = DIMENSIONS
+    meta_materials = {kind: list(materials) for kind, materials in META_MATERIALS.items()}
+    attribute_names = {}
+    for _, tables in legacy_tables:
+        dimensions = tables.get('dimensions', dimensions)
+        for kind, materials in tables.get('meta_materials', {}).items():
+            meta_materials[kind].extend(materials)
+        attribute_names.update(tables.get('attribute_names', {}))
+    meta_kinds = {material: kind for kind, materials in meta_materials.items() for material in materials}
+    return dimensions, meta_kinds, attribute_names
+
+
+def compile_tables():
+    # Snapshot data, only dicts, tuples, strings and ints so that marshal can store it
+    return {
+        'enchantments': ENCHANTMENTS,
+        'dye_colors': DYE_COLORS,
+        'firework_types': FIREWORK_TYPES,
+        'item_flags': ITEM_FLAGS,
+        'legacy_versions': tuple(first_version for first_version, _ in LEGACY_TABLES),
+        # [n] is for files predating the first n entries of LEGACY_TABLES
+        'table_sets': tuple(build_table_set(LEGACY_TABLES[:count]) for count in range(len(LEGACY_TABLES) + 1)),
+    }
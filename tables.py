@@ -0,0 +1,113 @@
+import os
+import sys
+import marshal
+import functools
+import contextvars
+from collections import namedtuple
+from types import MappingProxyType
+
+# Names and ids read from player.dat -> Bukkit names, one read-only table set per range of the file's DataVersion.
+# https://minecraft.wiki/w/Data_version
+# Only the input side of the tables changes between game versions, the output is for the BUKKIT_VERSION server. Item
+# stacks carry the file's DataVersion as item_version, so the server upgrades items of older files when it loads them,
+# capped at its own version: CraftBukkit refuses items newer than the server.
+# Every set is built once at import and never changed, so threads, pool workers and files saved by different
+# game versions share them. serialize_player_nbt activates the set of each file, see using().
+# The tables are defined in tabledata.py and compiled into a marshal snapshot next to the .pyc files, a process
+# start loads it with one read instead of importing tabledata and building the sets.
+
+# Target server (convert.BUKKIT_VERSION), files without DataVersion are taken as saved by it
+DEFAULT_DATA_VERSION = 3465
+# Bump on any change of the snapshot layout
+SNAPSHOT_VERSION = 2
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tabledata.py')
+SNAPSHOT_PATH = os.path.join(os.path.dirname(SOURCE_PATH), '__pycache__', 'tables.snapshot')
+
+
+def source_stamp():
+    # Like a .pyc, the snapshot is valid for the mtime and size of its source
+    stat = os.stat(SOURCE_PATH)
+    return SNAPSHOT_VERSION, marshal.version, stat.st_mtime_ns, stat.st_size
+
+
+def read_snapshot(stamp):
+    # Returns the snapshot data, None if it is missing, unreadable or stale
+    try:
+        with open(SNAPSHOT_PATH, 'rb') as in_file:
+            stored_stamp, data = marshal.loads(in_file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return data if stored_stamp == stamp else None
+
+
+def write_snapshot(stamp, data):
+    # Best effort like the .pyc files: skipped with PYTHONDONTWRITEBYTECODE, ignored in a read-only install.
+    # Temp file and rename, so concurrent pool workers never read a half-written snapshot.
+    if sys.dont_write_bytecode:
+        return
+    tmp_path = f'{SNAPSHOT_PATH}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+        with open(tmp_path, 'wb') as out_file:
+            out_file.write(marshal.dumps((stamp, data)))
+        os.replace(tmp_path, SNAPSHOT_PATH)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def load_snapshot():
+    stamp = source_stamp()
+    data = read_snapshot(stamp)
+    if data is None:
+        import tabledata
+        data = tabledata.compile_tables()
+        write_snapshot(stamp, data)
+    return data
+
+
+TableSet = namedtuple('TableSet', ('data_version', 'item_version', 'enchantments', 'dye_colors', 'firework_types',
+                                   'item_flags', 'dimensions', 'meta_kinds', 'attribute_names'))
+
+snapshot = load_snapshot()
+ENCHANTMENTS = MappingProxyType(snapshot['enchantments'])
+DYE_COLORS = snapshot['dye_colors']
+FIREWORK_TYPES = snapshot['firework_types']
+# (HideFlags bit, ItemFlag), in the order of the serialized list
+ITEM_FLAGS = snapshot['item_flags']
+# First DataVersion of each tabledata.LEGACY_TABLES entry, newest first
+LEGACY_VERSIONS = snapshot['legacy_versions']
+# TABLE_SETS[n] is for files predating the first n entries of LEGACY_VERSIONS
+TABLE_SETS = tuple(TableSet(None, None, ENCHANTMENTS, DYE_COLORS, FIREWORK_TYPES, ITEM_FLAGS,
+                            MappingProxyType(dimensions), MappingProxyType(meta_kinds),
+                            MappingProxyType(attribute_names))
+                   for dimensions, meta_kinds, attribute_names in snapshot['table_sets'])
+del snapshot
+
+
+@functools.lru_cache(maxsize=256)
+def for_version(data_version):
+    # Table set with the file's DataVersion, the tables themselves are shared with the other versions of its range
+    if data_version is None:
+        data_version = DEFAULT_DATA_VERSION
+    count = sum(1 for first_version in LEGACY_VERSIONS if data_version < first_version)
+    return TABLE_SETS[count]._replace(data_version=data_version, item_version=min(data_version, DEFAULT_DATA_VERSION))
+
+
+active = contextvars.ContextVar('tables', default=for_version(None))
+# Table set of the file being serialized, the default set outside of serialize_player_nbt
+current = active.get
+
+
+class using:
+    # with tables.using(data_version): ... activates the table set of a file in this thread (or asyncio task)
+    def __init__(self, data_version):
+        self.table_set = for_version(data_version)
+        self.token = None
+
+    def __enter__(self):
+        self.token = active.set(self.table_set)
+        return self.table_set
+
+    def __exit__(self, *exc_info):
+        active.reset(self.token)
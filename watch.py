@@ -0,0 +1,140 @@
+import os
+import re
+import sys
+import time
+import argparse
+
+import convert
+import mvinv
+
+# Converts players as the vanilla server saves them:
+#   python ./watch.py <playerdata dir> [MVWorld] --mv-data DIR [--mv-group GROUP] [--debounce S] [--interval S]
+# The server saves <uuid>.dat through a temp file and a rename, so every save changes the directory mtime.
+# The directory is listed only when its mtime changed, otherwise a poll is one stat plus one per pending file.
+# A listing compares names and inode numbers (from the directory entries, no stat), a rename gives the file a new
+# inode, so only new or replaced files are stat'ed, through the pending re-checks.
+# Temp files (and <uuid>.dat_old backups) don't match PLAYER_FILE and are ignored.
+
+PLAYER_FILE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.dat')
+# Directory mtime resolution of the slowest common filesystems, a change this close to the last listing may
+# not have moved the mtime yet, so the directory is listed again on the next poll
+MTIME_GRANULARITY_NS = 2 * 10 ** 9
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class Watcher:
+    def __init__(self, directory, debounce=2.0):
+        self.directory = directory
+        self.debounce = debounce
+        self.dir_mtime_ns = None
+        self.relist = True
+        self.files = {}  # path -> inode of the last seen (or converted) version
+        self.pending = {}  # path -> (signature or None before its first stat, time of the last change)
+
+    def list_files(self):
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if PLAYER_FILE.fullmatch(entry.name) and entry.is_file():
+                    files[entry.path] = entry.inode()
+        return files
+
+    def start(self):
+        # Files already in the directory are the baseline, returns their paths
+        self.dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        self.files = self.list_files()
+        self.relist = time.time_ns() - self.dir_mtime_ns < MTIME_GRANULARITY_NS
+        return sorted(self.files)
+
+    def poll(self, now=None):
+        # Returns paths unchanged for debounce seconds since their last change
+        now = time.monotonic() if now is None else now
+        dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        if dir_mtime_ns != self.dir_mtime_ns or self.relist:
+            self.dir_mtime_ns = dir_mtime_ns
+            self.relist = time.time_ns() - dir_mtime_ns < MTIME_GRANULARITY_NS
+            listed = self.list_files()
+            for path, inode in listed.items():
+                # A pending file is re-checked below anyway
+                if self.files.get(path) != inode and path not in self.pending:
+                    self.pending[path] = (None, now)
+            for path in self.files.keys() - listed.keys():
+                self.pending.pop(path, None)
+            self.files = {path: self.files.get(path) for path in listed}
+
+        ready = []
+        for path, (signature, changed) in list(self.pending.items()):
+            current = file_signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current != signature:
+                self.pending[path] = (current, now)  # rewritten again, wait for it to settle
+            elif now - changed >= self.debounce:
+                ready.append(path)
+        return sorted(ready)
+
+    def settle(self, path):
+        # Converted or failed (e.g. caught half-way), pending again after it is next saved (renamed over)
+        signature, _ = self.pending.pop(path)
+        self.files[path] = signature[0]
+
+
+def watch(directory, mv_world='world', output='.', debounce=2.0, interval=1.0, convert_existing=False):
+    watcher = Watcher(directory, debounce)
+    existing = watcher.start()
+    if convert_existing and existing:
+        convert.batch(existing, mv_world, output, workers=1)
+    print(f'Watching {directory} ({len(existing)} player files)', file=sys.stderr)
+    while True:
+        for player_filename in watcher.poll():
+            try:
+                path = convert.convert_file(player_filename, mv_world, output)
+            except Exception as e:
+                print(f'  {player_filename}: {convert.error_message(e)}', file=sys.stderr)
+            else:
+                print(f'{player_filename} -> {path}')
+            watcher.settle(player_filename)
+        sys.stdout.flush()
+        time.sleep(interval)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Convert player.dat files of a playerdata directory as they change')
+    parser.add_argument('source', help='playerdata directory')
+    parser.add_argument('world', nargs='?', default='world', help="Multiverse world(overworld) name, 'world' by default")
+    parser.add_argument('-o', '--output-dir', default='.', help='directory for the created .json files')
+    parser.add_argument('--mv-data', metavar='DIR', help='write into a Multiverse-Inventories data folder instead of -o')
+    parser.add_argument('--mv-group', metavar='GROUP', help='also write profiles into groups/GROUP/ of --mv-data')
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help='seconds a file must stay unchanged before it is converted, 2 by default')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls, 1 by default')
+    parser.add_argument('--convert-existing', action='store_true',
+                        help='convert the files already in the directory on start')
+    parser.add_argument('--usercache', metavar='FILE',
+                        help="server's usercache.json, fills in missing skull owner names and uuids")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    convert.configure(usercache=args.usercache)
+    output = args.output_dir
+    if args.mv_data:
+        output = mvinv.DataFolder(args.mv_data, args.world, args.mv_group)
+    else:
+        os.makedirs(output, exist_ok=True)
+    try:
+        watch(args.source, args.world, output, args.debounce, args.interval, args.convert_existing)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()